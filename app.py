@@ -1,94 +1,245 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import gspread
-from google.oauth2.service_account import Credentials
-import random
+import logging
 import os
 import json
+import time
+
+import metrics
+from metrics import (
+    ERRORS, SERVER_TIMING, Gauge, observe_request, server_timing_header, stage, start_request_timing, timed_parse
+)
+from profiler import ADMIN_TOKEN, ProfilerBusy, admin_authorized, sampling_profiler
+from question_bank import QuestionBank
+from questions import IncrementalParser
+from quiz_sessions import QuizSession, session_store_from_env
+from quiz_tokens import InvalidToken, quiz_token_signer
+from quizzes import DEFAULT_QUIZ, QUIZZES, PinnedQuiz, QuizRegistry, parse_quiz_config
+from sampling import STRATA_FIELDS, draw, request_rng
+from shared_bank import QUESTIONS_SHARED_PATH, SharedQuestionBank
+from sheets_client import SheetsThrottled, allow_retries, sheets_client, sheets_quota
+from sources import source_from_env
+from sqlite_store import QUESTIONS_SQLITE_PATH, GenerationChanged, SqliteQuestionBank, SqliteQuestionStore
+from structured_logging import new_request_id, setup_logging
+
+setup_logging()
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Request-ID"])
 
-# Configuración de Google Sheets
-SCOPES = [
-    'https://www.googleapis.com/auth/spreadsheets.readonly',
-    'https://www.googleapis.com/auth/drive.readonly'
-]
+# Endpoints que devuelven Server-Timing cuando SERVER_TIMING está habilitado
+SERVER_TIMING_PATHS = frozenset(("/api/get-questions", "/api/validate-answers"))
 
 def get_google_sheet():
-    """Conecta con Google Sheets usando credenciales"""
+    """Devuelve la hoja de Google Sheets usando el cliente compartido del proceso"""
     try:
-        # Las credenciales deben estar en una variable de entorno como JSON string
-        creds_json = os.environ.get('GOOGLE_CREDENTIALS')
-        if not creds_json:
-            raise ValueError("GOOGLE_CREDENTIALS no configurado")
-        
-        creds_dict = json.loads(creds_json)
-        creds = Credentials.from_service_account_info(creds_dict, scopes=SCOPES)
-        client = gspread.authorize(creds)
-        
-        # ID del documento de Google Sheets (desde variable de entorno)
-        sheet_id = os.environ.get('SHEET_ID')
-        if not sheet_id:
-            raise ValueError("SHEET_ID no configurado")
-        
-        sheet = client.open_by_key(sheet_id).sheet1
-        return sheet
+        return sheets_client.get_worksheet()
     except Exception as e:
-        print(f"Error conectando con Google Sheets: {str(e)}")
+        logger.error("Error conectando con Google Sheets: %s", e)
         raise
 
-def parse_question_row(row, row_index):
-    """Parsea una fila del sheet a formato de pregunta"""
-    if len(row) < 7:  # Necesitamos al menos columnas A-G
-        return None
-    
-    # Columna A: ID (si está vacía, usar índice de fila)
-    question_id = row[0] if row[0] else f"pregunta_{row_index}"
-    
-    # Columna B: Pregunta
-    question_text = row[1] if len(row) > 1 else ""
-    if not question_text:
-        return None
-    
-    # Columnas C, D, E, F: Opciones
-    opciones_originales = [
-        {"codigo": "A", "texto": row[2] if len(row) > 2 else ""},
-        {"codigo": "B", "texto": row[3] if len(row) > 3 else ""},
-        {"codigo": "C", "texto": row[4] if len(row) > 4 else ""},
-        {"codigo": "D", "texto": row[5] if len(row) > 5 else ""}
-    ]
-    
-    # Filtrar opciones vacías
-    opciones_originales = [op for op in opciones_originales if op["texto"]]
-    
-    if len(opciones_originales) < 2:  # Al menos 2 opciones
+# Origen de las preguntas (Google Sheets salvo que QUESTIONS_SOURCE indique otro)
+question_source = source_from_env()
+
+def fetch_row_blocks():
+    """Obtiene las filas del origen configurado, bloque por bloque"""
+    try:
+        yield from question_source.iter_blocks()
+    except Exception as e:
+        logger.error("Error obteniendo datos del origen %s: %s", question_source.kind, e)
+        raise
+
+# Recuerda las filas ya parseadas: en cada refresco solo se parsean las que cambiaron
+incremental_parser = IncrementalParser()
+
+def load_questions():
+    """Descarga las filas del origen y parsea las preguntas nuevas o modificadas (saltando encabezado si existe)"""
+    logger.debug("Obteniendo datos del origen %s...", question_source.kind)
+    preguntas, cambios = timed_parse(incremental_parser, fetch_row_blocks())
+    total_rows = incremental_parser.last_rows
+    logger.info(
+        "Se parsearon %d preguntas válidas de %d filas (%d parseadas, %d reutilizadas)",
+        len(preguntas), total_rows, incremental_parser.last_parsed, incremental_parser.last_reused
+    )
+    return preguntas, total_rows, cambios
+
+# Banco de preguntas en memoria compartido por todas las peticiones del worker,
+# por todos los workers del host si se configura QUESTIONS_SHARED_PATH, o en
+# una base SQLite indexada si se configura QUESTIONS_SQLITE_PATH
+if QUESTIONS_SQLITE_PATH:
+    question_bank = SqliteQuestionBank(
+        load_questions, SqliteQuestionStore(QUESTIONS_SQLITE_PATH),
+        get_revision=question_source.get_revision
+    )
+elif QUESTIONS_SHARED_PATH:
+    question_bank = SharedQuestionBank(
+        load_questions, QUESTIONS_SHARED_PATH, get_revision=question_source.get_revision
+    )
+else:
+    question_bank = QuestionBank(load_questions, get_revision=question_source.get_revision)
+
+# Arranque en frío: servir la copia local (si existe) mientras se consulta Sheets
+question_bank.load_snapshot()
+
+# Otros quizzes configurados en QUIZZES, cada uno con su banco. El banco principal
+# es el quiz por defecto, salvo que solo se hayan configurado quizzes en QUIZZES.
+quiz_configs = parse_quiz_config(QUIZZES) if QUIZZES else {}
+main_bank_configured = not quiz_configs or question_source.kind != "sheets" or bool(os.environ.get('SHEET_ID'))
+quiz_registry = QuizRegistry(
+    quiz_configs, default=PinnedQuiz(DEFAULT_QUIZ, question_bank) if main_bank_configured else None
+)
+
+# Sesiones de quiz en el servidor (QUIZ_SESSION_STORE); None si no están habilitadas
+session_store = session_store_from_env()
+
+def served_quizzes():
+    """Quiz por defecto y quizzes cargados, con el cliente de Sheets de cada uno (o None)"""
+    quizzes = []
+    if quiz_registry.default is not None:
+        client = sheets_client if question_source.kind == "sheets" else None
+        quizzes.append((quiz_registry.default, client))
+    quizzes.extend((quiz, quiz.source.client) for quiz in quiz_registry.loaded())
+    return quizzes
+
+def bank_stat(key):
+    return lambda: [((quiz.quiz_id,), quiz.bank.stats()[key]) for quiz, _ in served_quizzes()]
+
+def sheets_client_stats():
+    for quiz, client in served_quizzes():
+        if client is not None:
+            stats = client.stats()
+            yield (quiz.quiz_id, "reutilizado"), stats["hits"]
+            yield (quiz.quiz_id, "reconstruido"), stats["reconstrucciones"]
+
+# Valores que ya llevan el banco, el cliente y el parser, leídos en cada scrape
+Gauge("quiz_bank_questions", "Preguntas en la versión actual del banco", ("quiz",), bank_stat("preguntas"))
+Gauge("quiz_bank_age_seconds", "Segundos desde que se cargó la versión actual", ("quiz",), bank_stat("edad_segundos"))
+Gauge("quiz_bank_refreshes_total", "Refrescos completados del banco", ("quiz",), bank_stat("refrescos"), kind="counter")
+Gauge("quiz_bank_refresh_errors_total", "Refrescos del banco que fallaron", ("quiz",),
+      bank_stat("errores_refresco"), kind="counter")
+Gauge("quiz_sheets_client_total", "Accesos a la hoja: cliente reutilizado (hit) o reconstruido (miss)",
+      ("quiz", "resultado"), sheets_client_stats, kind="counter")
+def sheets_throttle_stats():
+    for quiz, client in served_quizzes():
+        if client is not None:
+            stats = client.stats()
+            for evento, key in (("limitada_429", "limitadas_429"), ("reintento", "reintentos"),
+                                ("abandonada", "abandonadas")):
+                yield (quiz.quiz_id, evento), stats[key]
+
+Gauge("quiz_sheets_throttle_total", "Respuestas 429 de Google Sheets, reintentos y lecturas abandonadas",
+      ("quiz", "evento"), sheets_throttle_stats, kind="counter")
+Gauge("quiz_sheets_quota_available", "Lecturas a Google Sheets que quedan en el cupo del proceso", (),
+      lambda: [((), sheets_quota.available())])
+Gauge("quiz_sheets_quota_rejected_total", "Lecturas no hechas por falta de cupo (se sirvió la versión en caché)", (),
+      lambda: [((), sheets_quota.rejected)], kind="counter")
+Gauge("quiz_parser_rows_total", "Filas del banco principal parseadas o reutilizadas de un refresco anterior",
+      ("resultado",), lambda: [
+          (("parseada",), incremental_parser.total_parsed),
+          (("reutilizada",), incremental_parser.total_reused),
+      ], kind="counter")
+Gauge("quiz_sessions_active", "Sesiones de quiz vigentes (solo con el backend en memoria)", (),
+      lambda: [((), session_store.active())] if session_store is not None else [])
+
+def resolve_quiz(data):
+    """Quiz indicado en ``quiz`` (o el por defecto); None si no existe"""
+    quiz_id = data.get('quiz')
+    if quiz_id is not None and not isinstance(quiz_id, str):
         return None
+    return quiz_registry.get(quiz_id)
+
+def quiz_ready(data):
+    """True si atender la petición no va a esperar la primera carga de un banco"""
+    if session_store is not None and session_store.blocking:
+        # Cada petición consulta el backend de sesiones por la red
+        return False
+    if not isinstance(data, dict) or isinstance(data.get('token'), str) or isinstance(data.get('sesion'), str):
+        # Las validaciones con token o sesión no usan el banco
+        return True
+    quiz = resolve_quiz(data)
+    return quiz is None or quiz.bank.ready
+
+def unknown_quiz_response(data):
+    return {
+        "error": "Quiz no encontrado",
+        "quiz": data.get('quiz'),
+        "disponibles": quiz_registry.available()
+    }, 404
+
+def score_answers(preguntas_dict, respuestas_usuario):
+    """Califica una lista de respuestas; el costo depende solo de las respuestas enviadas"""
+    with stage("calificacion"):
+        return _score_answers(preguntas_dict, respuestas_usuario)
+
+def _score_answers(preguntas_dict, respuestas_usuario):
+    resultados = []
+    puntaje_total = 0
+    correctas = 0
+    incorrectas = 0
     
-    # Columna G: Respuesta correcta
-    respuesta_correcta = row[6] if len(row) > 6 else ""
+    for respuesta in respuestas_usuario:
+        question_id = respuesta.get('id')
+        respuesta_enviada = respuesta.get('respuesta', '').strip().upper()
+        
+        question = preguntas_dict.get(question_id)
+        if question is None:
+            resultados.append({
+                "id": question_id,
+                "error": "Pregunta no encontrada",
+                "puntaje": 0
+            })
+            incorrectas += 1
+            continue
+        
+        respuesta_correcta = question.answer
+        es_correcta = respuesta_enviada == respuesta_correcta
+        puntaje = 1 if es_correcta else 0
+        
+        resultados.append({
+            "id": question_id,
+            "correcta": es_correcta,
+            "respuesta_enviada": respuesta_enviada,
+            "respuesta_correcta": respuesta_correcta,
+            "puntaje": puntaje
+        })
+        
+        puntaje_total += puntaje
+        if es_correcta:
+            correctas += 1
+        else:
+            incorrectas += 1
     
     return {
-        "id": question_id,
-        "pregunta": question_text,
-        "opciones": opciones_originales,
-        "respuesta_correcta": respuesta_correcta.strip().upper()
+        "resultados": resultados,
+        "puntaje_total": puntaje_total,
+        "total_preguntas": len(respuestas_usuario),
+        "correctas": correctas,
+        "incorrectas": incorrectas
     }
 
-@app.route('/')
-def home():
-    return jsonify({
+def home_response():
+    return {
         "mensaje": "API de Preguntas v1.0",
         "endpoints": {
             "obtener_preguntas": "POST /api/get-questions",
             "validar_respuestas": "POST /api/validate-answers",
-            "diagnostico": "GET /api/test-connection"
+            "validar_lote": "POST /api/validate-answers/batch",
+            "diagnostico": "GET /api/test-connection",
+            "estadisticas": "GET /api/stats",
+            "metricas": "GET /metrics",
+            "quizzes": "GET /api/quizzes"
         }
-    })
+    }, 200
 
-@app.route('/api/test-connection', methods=['GET'])
-def test_connection():
-    """Endpoint de diagnóstico para probar la conexión con Google Sheets"""
+def quizzes_response():
+    return {
+        "quizzes": quiz_registry.available(),
+        "por_defecto": quiz_registry.default_id()
+    }, 200
+
+def connection_diagnostics():
+    """Prueba la conexión con Google Sheets y arma el diagnóstico"""
     diagnostico = {
         "google_credentials_configurado": False,
         "sheet_id_configurado": False,
@@ -120,20 +271,20 @@ def test_connection():
     
     if not creds_json:
         diagnostico["error"] = "GOOGLE_CREDENTIALS no está configurado en las variables de entorno"
-        return jsonify(diagnostico), 500
+        return diagnostico, 500
     
     if not sheet_id:
         diagnostico["error"] = "SHEET_ID no está configurado en las variables de entorno"
-        return jsonify(diagnostico), 500
+        return diagnostico, 500
     
     # Ahora intentar conectar
     try:
-        print("Intentando conectar con Google Sheets...")
-        sheet = get_google_sheet()
-        print("Conexión exitosa!")
+        logger.debug("Intentando conectar con Google Sheets...")
+        get_google_sheet()
+        logger.debug("Conexión exitosa")
         
-        # Obtener datos
-        all_rows = sheet.get_all_values()
+        # Obtener datos (dentro del cupo de lecturas, con reintentos ante un 429)
+        all_rows = sheets_client.call(lambda sheet: sheet.get_all_values())
         diagnostico["conexion_exitosa"] = True
         diagnostico["filas_encontradas"] = len(all_rows)
         
@@ -145,167 +296,417 @@ def test_connection():
                 "filas_con_datos": len([r for r in all_rows if any(r)])
             }
         
-        return jsonify(diagnostico), 200
+        diagnostico["cliente_sheets"] = sheets_client.stats()
+        return diagnostico, 200
         
     except Exception as e:
         diagnostico["error"] = f"{type(e).__name__}: {str(e)}"
         diagnostico["instrucciones"] = f"DEBES COMPARTIR tu Google Sheet con este email: {diagnostico['service_account_email']}"
-        import traceback
-        print(traceback.format_exc())
-        return jsonify(diagnostico), 500
+        logger.exception("Falló el diagnóstico de conexión con Google Sheets")
+        return diagnostico, 500
 
-@app.route('/api/get-questions', methods=['POST'])
-def get_questions():
-    """Endpoint para obtener preguntas aleatorias"""
+def stats_response():
+    return {
+        "origen": question_source.describe(),
+        "cliente_sheets": sheets_client.stats(),
+        "cupo_sheets": sheets_quota.stats(),
+        "banco_preguntas": question_bank.stats(),
+        "parseo_incremental": incremental_parser.stats(),
+        "quizzes": quiz_registry.stats(),
+        "tokens_quiz": quiz_token_signer.stats() if quiz_token_signer else None,
+        "sesiones_quiz": session_store.stats() if session_store else None,
+        "profiler": sampling_profiler.stats()
+    }, 200
+
+def admin_error(token):
+    """Respuesta de error si el token no habilita la administración, o None si la habilita"""
+    if not ADMIN_TOKEN:
+        return {"error": "Endpoints de administración deshabilitados (falta ADMIN_TOKEN)"}, 404
+    if not admin_authorized(token):
+        return {"error": "Token de administración inválido"}, 403
+    return None
+
+def profile_response(data, token):
+    """Inicia en segundo plano una ventana de profiling de ``segundos``; el resultado se pide con GET ?pid="""
+    error = admin_error(token)
+    if error:
+        return error
+    
+    segundos = data.get('segundos', 10) if isinstance(data, dict) else 10 if data is None else None
+    if isinstance(segundos, bool) or not isinstance(segundos, (int, float)) or segundos <= 0:
+        return {"error": "segundos debe ser un número positivo"}, 400
+    
     try:
-        data = request.get_json()
-        cantidad = data.get('cantidad', 5)
-        
-        if not isinstance(cantidad, int) or cantidad <= 0:
-            return jsonify({"error": "La cantidad debe ser un número entero positivo"}), 400
-        
-        # Obtener datos del sheet
-        print("Intentando conectar con Google Sheets...")
-        sheet = get_google_sheet()
-        print("Conexión exitosa, obteniendo datos...")
-        all_rows = sheet.get_all_values()
-        print(f"Se obtuvieron {len(all_rows)} filas del documento")
-        
-        # Parsear preguntas (saltando encabezado si existe)
-        preguntas = []
-        for idx, row in enumerate(all_rows[1:], start=2):  # Empezar desde fila 2
-            question = parse_question_row(row, idx)
-            if question:
-                preguntas.append(question)
-        
-        print(f"Se parsearon {len(preguntas)} preguntas válidas")
-        
-        if not preguntas:
-            return jsonify({
-                "error": "No se encontraron preguntas válidas en el documento",
-                "filas_totales": len(all_rows),
-                "ayuda": "Verifica que tu Sheet tenga datos en las columnas B (pregunta), C-F (opciones) y G (respuesta correcta)"
-            }), 404
-        
-        # Seleccionar preguntas aleatorias
-        cantidad_disponible = min(cantidad, len(preguntas))
-        preguntas_seleccionadas = random.sample(preguntas, cantidad_disponible)
+        segundos, pid = sampling_profiler.start(segundos)
+    except ProfilerBusy as e:
+        return {"error": str(e)}, 409
+    logger.info("Profiling iniciado por %s segundos", segundos)
+    return {"estado": "en curso", "segundos": segundos, "pid": pid}, 202
+
+def profile_result_response(token, pid=None):
+    """Pilas colapsadas de la ventana del worker ``pid`` (o de la última del host), como texto.
+
+    Lo puede responder cualquier worker: el resultado está en PROFILER_DIR.
+    """
+    error = admin_error(token)
+    if error:
+        return error
+    
+    if pid is not None:
+        if not pid.isdigit():
+            return {"error": "pid debe ser un número entero"}, 400
+        pid = int(pid)
+    estado, pilas = sampling_profiler.result(pid)
+    if estado == "en curso":
+        return {"estado": estado, "pid": pid}, 202
+    if estado is None:
+        return {"error": "No hay resultados de profiling", "pid": pid}, 404
+    return pilas, 200
+
+def questions_response(data):
+    """Selecciona preguntas aleatorias con sus opciones mezcladas.
+
+    Opcionalmente filtra por ``categoria``/``dificultad`` y reparte la
+    muestra entre estratos con ``estratificar`` (y ``pesos`` por estrato).
+    Con ``token: true`` devuelve además un token firmado con el que
+    validate-answers califica sin consultar el banco, y con las sesiones
+    habilitadas, el ID de la sesión registrada.
+    """
+    cantidad = data.get('cantidad', 5)
+    
+    if not isinstance(cantidad, int) or cantidad <= 0:
+        return {"error": "La cantidad debe ser un número entero positivo"}, 400
+    
+    filtros = {STRATA_FIELDS[campo]: data[campo] for campo in STRATA_FIELDS if data.get(campo)}
+    if not all(isinstance(valor, str) for valor in filtros.values()):
+        return {"error": "Los filtros deben ser texto"}, 400
+    
+    estratificar = data.get('estratificar')
+    if estratificar is not None and estratificar not in STRATA_FIELDS:
+        return {"error": f"Solo se puede estratificar por: {', '.join(STRATA_FIELDS)}"}, 400
+    
+    pesos = data.get('pesos')
+    if pesos is not None and (
+            not isinstance(pesos, dict) or
+            not all(isinstance(p, (int, float)) and p >= 0 for p in pesos.values())):
+        return {"error": "Los pesos deben ser un objeto con números no negativos"}, 400
+    
+    con_token = bool(data.get('token'))
+    if con_token and quiz_token_signer is None:
+        return {"error": "Los tokens de quiz no están habilitados (falta QUIZ_TOKEN_SECRET)"}, 400
+    
+    # Obtener preguntas del banco en memoria del quiz
+    quiz = resolve_quiz(data)
+    if quiz is None:
+        return unknown_quiz_response(data)
+    banco = quiz.bank.get()
+    preguntas = banco.questions
+    
+    if not preguntas:
+        return {
+            "error": "No se encontraron preguntas válidas en el documento",
+            "filas_totales": banco.total_rows,
+            "ayuda": "Verifica que tu Sheet tenga datos en las columnas B (pregunta), C-F (opciones) y G (respuesta correcta)"
+        }, 404
+    
+    with stage("muestreo"):
+        rng = request_rng()
+        try:
+            elegidas = draw_questions(banco, cantidad, rng, filtros, estratificar, pesos)
+        except GenerationChanged:
+            # Otro worker sincronizó la base SQLite: se vuelve a elegir en la versión nueva
+            elegidas = draw_questions(quiz.bank.get(), cantidad, rng, filtros, estratificar, pesos)
         
         # Mezclar opciones de cada pregunta
         resultado = []
-        for pregunta in preguntas_seleccionadas:
-            opciones_mezcladas = random.sample(pregunta["opciones"], len(pregunta["opciones"]))
-            resultado.append({
-                "id": pregunta["id"],
-                "pregunta": pregunta["pregunta"],
-                "opciones": opciones_mezcladas
-            })
-        
-        return jsonify({"preguntas": resultado}), 200
+        ordenes = []
+        for pregunta in elegidas:
+            total_opciones = len(pregunta.options)
+            orden = rng.sample(range(total_opciones), total_opciones)
+            ordenes.append(orden)
+            resultado.append(pregunta.to_public(orden))
+    
+    if not elegidas:
+        return {"error": "No hay preguntas que cumplan los filtros indicados"}, 404
+    
+    respuesta = {"preguntas": resultado}
+    if con_token:
+        respuesta["token"] = quiz_token_signer.issue(quiz.quiz_id, elegidas)
+    if session_store is not None:
+        sesion = QuizSession.create(quiz.quiz_id, elegidas, ordenes)
+        session_store.save(sesion)
+        respuesta["sesion"] = sesion.session_id
+    return respuesta, 200
+
+def draw_questions(banco, cantidad, rng, filtros, estratificar, pesos):
+    """Preguntas elegidas al azar sin copiar el banco"""
+    indices = draw(
+        banco, cantidad, rng, filters=filtros,
+        stratify_by=STRATA_FIELDS.get(estratificar), weights=pesos
+    )
+    return [banco.questions[i] for i in indices]
+
+def validation_response(data):
+    """Califica las respuestas enviadas, contra la sesión o el token del quiz si viene uno"""
+    respuestas_usuario = data.get('respuestas', [])
+    
+    if not respuestas_usuario:
+        return {"error": "No se enviaron respuestas"}, 400
+    
+    sesion_id = data.get('sesion')
+    if sesion_id is not None:
+        return session_validation_response(sesion_id, respuestas_usuario)
+    
+    token = data.get('token')
+    if token is not None:
+        return token_validation_response(token, respuestas_usuario)
+    
+    # Validar contra el índice por ID de la versión actual del banco del quiz
+    quiz = resolve_quiz(data)
+    if quiz is None:
+        return unknown_quiz_response(data)
+    banco = quiz.bank.get()
+    return score_answers(banco.index, respuestas_usuario), 200
+
+def token_validation_response(token, respuestas_usuario):
+    """Califica solo con la clave de respuestas del token, sin tocar el banco"""
+    if quiz_token_signer is None:
+        return {"error": "Los tokens de quiz no están habilitados (falta QUIZ_TOKEN_SECRET)"}, 400
+    try:
+        claims = quiz_token_signer.verify(token)
+    except InvalidToken as e:
+        return {"error": "Token de quiz inválido", "detalle": str(e)}, 400
+    
+    resultado = score_answers(claims.answers, respuestas_usuario)
+    resultado["quiz"] = claims.quiz_id
+    return resultado, 200
+
+def session_validation_response(sesion_id, respuestas_usuario):
+    """Califica contra las preguntas de la sesión; una entrega repetida recibe el primer resultado"""
+    if session_store is None:
+        return {"error": "Las sesiones de quiz no están habilitadas (falta QUIZ_SESSION_STORE)"}, 400
+    if not isinstance(sesion_id, str):
+        return {"error": "La sesión debe ser texto"}, 400
+    
+    sesion = session_store.get(sesion_id)
+    if sesion is None:
+        return {"error": "Sesión no encontrada o vencida", "sesion": sesion_id}, 404
+    
+    if not session_store.claim(sesion_id):
+        anterior = session_store.duplicate_result(sesion_id)
+        if anterior is None:
+            return {"error": "La sesión ya se está validando", "sesion": sesion_id}, 409
+        return {**anterior, "duplicada": True}, 200
     
+    try:
+        resultado = score_answers(sesion.answer_index(), respuestas_usuario)
+    except BaseException:
+        session_store.release(sesion_id)
+        raise
+    resultado["quiz"] = sesion.quiz_id
+    resultado["sesion"] = sesion_id
+    session_store.save_result(sesion_id, resultado)
+    return resultado, 200
+
+def iter_ndjson(lines):
+    """Un envío por línea no vacía; las líneas que no son JSON se entregan como texto (y fallan al calificar)"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield line.decode("utf-8", "replace") if isinstance(line, bytes) else line
+
+def score_submission(envio, indices):
+    """Califica un envío del lote; ``indices`` guarda el índice de cada quiz mientras dura el lote"""
+    if not isinstance(envio, dict):
+        return {"error": "Cada envío debe ser un objeto JSON"}, 400
+    if envio.get('sesion') is not None or envio.get('token') is not None:
+        return validation_response(envio)
+    
+    respuestas_usuario = envio.get('respuestas')
+    if not respuestas_usuario or not isinstance(respuestas_usuario, list):
+        return {"error": "No se enviaron respuestas"}, 400
+    
+    quiz_id = envio.get('quiz')
+    if quiz_id is not None and not isinstance(quiz_id, str):
+        return unknown_quiz_response(envio)
+    index = indices.get(quiz_id)
+    if index is None:
+        quiz = resolve_quiz(envio)
+        if quiz is None:
+            return unknown_quiz_response(envio)
+        index = indices[quiz_id] = quiz.bank.get().index
+    return score_answers(index, respuestas_usuario), 200
+
+def batch_item(numero, envio, indices):
+    """Resultado de un envío tal como se emite en la respuesta NDJSON"""
+    payload, status = handle_endpoint(score_submission, "Error al validar el envío", envio, indices)
+    item = {"envio": numero, "estado": status}
+    if isinstance(envio, dict) and 'id' in envio:
+        item["id"] = envio['id']
+    item.update(payload)
+    return item
+
+def batch_validation(envios):
+    """Califica los envíos uno tras otro y produce un resultado por envío y un resumen al final"""
+    indices = {}
+    total = con_error = 0
+    for numero, envio in enumerate(envios, start=1):
+        item = batch_item(numero, envio, indices)
+        total += 1
+        if item["estado"] != 200:
+            con_error += 1
+        yield item
+    yield {"resumen": {"envios": total, "con_error": con_error}}
+
+def batch_envelope(data):
+    """Lista de envíos de un cuerpo JSON {"envios": [...]}, o None si no tiene esa forma"""
+    if isinstance(data, dict) and isinstance(data.get('envios'), list):
+        return data['envios']
+    return None
+
+def ndjson_lines(items):
+    for item in items:
+        yield json.dumps(item, ensure_ascii=False) + "\n"
+
+def handle_endpoint(builder, error_mensaje, *args):
+    """Ejecuta un endpoint y traduce los errores a respuestas JSON (payload, status)"""
+    try:
+        return builder(*args)
+    except SheetsThrottled as st:
+        # Solo llega acá si todavía no hay ninguna versión del banco para servir
+        ERRORS.inc(builder.__name__, type(st).__name__)
+        logger.warning("%s: %s", error_mensaje, st)
+        return {
+            "error": "Google Sheets está limitando las lecturas",
+            "detalle": str(st),
+            "reintentar_en_segundos": round(st.retry_after, 1)
+        }, 503
     except ValueError as ve:
-        print(f"Error de configuración: {str(ve)}")
-        return jsonify({
+        ERRORS.inc(builder.__name__, type(ve).__name__)
+        logger.error("Error de configuración: %s", ve)
+        return {
             "error": "Error de configuración",
             "detalle": str(ve),
             "ayuda": "Verifica que GOOGLE_CREDENTIALS y SHEET_ID estén configurados en las variables de entorno"
-        }), 500
+        }, 500
     except Exception as e:
-        print(f"Error inesperado: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "error": "Error al obtener preguntas",
+        ERRORS.inc(builder.__name__, type(e).__name__)
+        logger.exception("%s: %s", error_mensaje, e)
+        return {
+            "error": error_mensaje,
             "detalle": str(e),
             "tipo": type(e).__name__
-        }), 500
+        }, 500
+
+@app.before_request
+def start_request():
+    """Asigna el ID de la petición (el de X-Request-ID si el cliente lo envía)"""
+    g.request_id = new_request_id(request.headers.get('X-Request-ID'))
+    g.started_at = time.perf_counter()
+    allow_retries(False)
+    if SERVER_TIMING:
+        start_request_timing(request.path in SERVER_TIMING_PATHS)
+
+@app.after_request
+def finish_request(response):
+    response.headers['X-Request-ID'] = g.request_id
+    # En las respuestas NDJSON es el tiempo hasta empezar a enviar el cuerpo
+    elapsed = time.perf_counter() - g.started_at
+    if SERVER_TIMING:
+        timing = server_timing_header(elapsed)
+        if timing is not None:
+            response.headers['Server-Timing'] = timing
+            response.headers['Timing-Allow-Origin'] = '*'
+    endpoint = request.url_rule.rule if request.url_rule is not None else "desconocido"
+    observe_request(endpoint, request.method, response.status_code, elapsed)
+    logger.debug(
+        "%s %s -> %d", request.method, request.path, response.status_code,
+        extra={"duracion_ms": round(elapsed * 1000, 2)}
+    )
+    return response
+
+def json_response(payload, status):
+    with stage("serializacion"):
+        return jsonify(payload), status
+
+@app.route('/')
+def home():
+    payload, status = home_response()
+    return json_response(payload, status)
+
+@app.route('/api/test-connection', methods=['GET'])
+def test_connection():
+    """Endpoint de diagnóstico para probar la conexión con Google Sheets"""
+    payload, status = connection_diagnostics()
+    return json_response(payload, status)
+
+@app.route('/api/stats', methods=['GET'])
+def stats():
+    """Endpoint de monitoreo con los contadores internos"""
+    payload, status = stats_response()
+    return json_response(payload, status)
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/admin/profile', methods=['POST', 'GET'])
+def profile():
+    """Endpoint de administración: POST inicia una ventana de profiling, GET devuelve sus pilas colapsadas"""
+    token = request.headers.get('X-Admin-Token')
+    if request.method == 'GET':
+        payload, status = handle_endpoint(
+            profile_result_response, "Error en el profiling", token, request.args.get('pid')
+        )
+    else:
+        payload, status = handle_endpoint(
+            profile_response, "Error en el profiling", request.get_json(silent=True), token
+        )
+    if isinstance(payload, str):
+        return Response(payload, mimetype='text/plain'), status
+    return json_response(payload, status)
+
+@app.route('/api/quizzes', methods=['GET'])
+def quizzes():
+    """Endpoint con los quizzes disponibles"""
+    payload, status = quizzes_response()
+    return json_response(payload, status)
+
+@app.route('/api/get-questions', methods=['POST'])
+def get_questions():
+    """Endpoint para obtener preguntas aleatorias"""
+    payload, status = handle_endpoint(
+        questions_response, "Error al obtener preguntas", request.get_json(silent=True)
+    )
+    return json_response(payload, status)
 
 @app.route('/api/validate-answers', methods=['POST'])
 def validate_answers():
     """Endpoint para validar respuestas"""
-    try:
-        data = request.get_json()
-        respuestas_usuario = data.get('respuestas', [])
-        
-        if not respuestas_usuario:
-            return jsonify({"error": "No se enviaron respuestas"}), 400
-        
-        # Obtener datos del sheet
-        print("Intentando conectar con Google Sheets para validar...")
-        sheet = get_google_sheet()
-        print("Conexión exitosa, obteniendo datos...")
-        all_rows = sheet.get_all_values()
-        
-        # Crear diccionario de preguntas con respuestas correctas
-        preguntas_dict = {}
-        for idx, row in enumerate(all_rows[1:], start=2):
-            question = parse_question_row(row, idx)
-            if question:
-                preguntas_dict[question["id"]] = question
-        
-        print(f"Se cargaron {len(preguntas_dict)} preguntas para validación")
-        
-        # Validar respuestas
-        resultados = []
-        puntaje_total = 0
-        correctas = 0
-        incorrectas = 0
-        
-        for respuesta in respuestas_usuario:
-            question_id = respuesta.get('id')
-            respuesta_enviada = respuesta.get('respuesta', '').strip().upper()
-            
-            if question_id not in preguntas_dict:
-                resultados.append({
-                    "id": question_id,
-                    "error": "Pregunta no encontrada",
-                    "puntaje": 0
-                })
-                incorrectas += 1
-                continue
-            
-            respuesta_correcta = preguntas_dict[question_id]["respuesta_correcta"]
-            es_correcta = respuesta_enviada == respuesta_correcta
-            puntaje = 1 if es_correcta else 0
-            
-            resultados.append({
-                "id": question_id,
-                "correcta": es_correcta,
-                "respuesta_enviada": respuesta_enviada,
-                "respuesta_correcta": respuesta_correcta,
-                "puntaje": puntaje
-            })
-            
-            puntaje_total += puntaje
-            if es_correcta:
-                correctas += 1
-            else:
-                incorrectas += 1
-        
-        return jsonify({
-            "resultados": resultados,
-            "puntaje_total": puntaje_total,
-            "total_preguntas": len(respuestas_usuario),
-            "correctas": correctas,
-            "incorrectas": incorrectas
-        }), 200
-    
-    except ValueError as ve:
-        print(f"Error de configuración: {str(ve)}")
-        return jsonify({
-            "error": "Error de configuración",
-            "detalle": str(ve),
-            "ayuda": "Verifica que GOOGLE_CREDENTIALS y SHEET_ID estén configurados en las variables de entorno"
-        }), 500
-    except Exception as e:
-        print(f"Error inesperado al validar: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        return jsonify({
-            "error": "Error al validar respuestas",
-            "detalle": str(e),
-            "tipo": type(e).__name__
-        }), 500
+    payload, status = handle_endpoint(
+        validation_response, "Error al validar respuestas", request.get_json(silent=True)
+    )
+    return json_response(payload, status)
+
+@app.route('/api/validate-answers/batch', methods=['POST'])
+def validate_answers_batch():
+    """Endpoint para calificar muchos envíos en una sola petición.
+
+    Acepta {"envios": [...]} o un cuerpo NDJSON (un envío por línea, que se
+    lee a medida que llega) y responde en NDJSON, un resultado por envío.
+    """
+    if request.mimetype == 'application/x-ndjson':
+        envios = iter_ndjson(request.stream)
+    else:
+        envios = batch_envelope(request.get_json(silent=True))
+        if envios is None:
+            return jsonify({"error": "Se esperaba {\"envios\": [...]} o un cuerpo NDJSON"}), 400
+    return Response(stream_with_context(ndjson_lines(batch_validation(envios))), mimetype='application/x-ndjson')
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
@@ -0,0 +1,279 @@
+"""Variante ASGI de la API de preguntas.
+
+Sirve los mismos endpoints que app.py desde un event loop, de modo que un
+solo proceso atiende muchas peticiones concurrentes aunque haya una
+descarga de Google Sheets en curso: todo lo que puede bloquear (el primer
+llenado del banco, el diagnóstico de conexión) se ejecuta en el pool de
+hilos del loop y se espera con ``await``.
+
+    uvicorn asgi:app --port 5000
+    gunicorn -k uvicorn.workers.UvicornWorker asgi:app
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import time
+from collections import namedtuple
+from urllib.parse import parse_qs
+
+from app import (
+    SERVER_TIMING_PATHS,
+    batch_envelope,
+    batch_validation,
+    connection_diagnostics,
+    handle_endpoint,
+    profile_response,
+    profile_result_response,
+    home_response,
+    iter_ndjson,
+    ndjson_lines,
+    quiz_ready,
+    quiz_registry,
+    questions_response,
+    quizzes_response,
+    stats_response,
+    validation_response,
+)
+import metrics
+from metrics import SERVER_TIMING, observe_request, server_timing_header, stage, start_request_timing
+from sheets_client import allow_retries
+from structured_logging import new_request_id, request_id_var
+
+logger = logging.getLogger(__name__)
+
+# blocking: siempre fuera del loop; uses_bank: fuera del loop solo si el banco está frío
+Route = namedtuple("Route", "builder error_mensaje has_body blocking uses_bank")
+
+ROUTES = {
+    ("GET", "/"): Route(home_response, "Error interno", False, False, False),
+    ("GET", "/api/test-connection"): Route(connection_diagnostics, "Error en el diagnóstico", False, True, False),
+    ("GET", "/api/stats"): Route(stats_response, "Error interno", False, False, False),
+    ("GET", "/api/quizzes"): Route(quizzes_response, "Error interno", False, False, False),
+    ("POST", "/api/get-questions"): Route(questions_response, "Error al obtener preguntas", True, False, True),
+    ("POST", "/api/validate-answers"): Route(validation_response, "Error al validar respuestas", True, False, True),
+}
+
+BATCH_PATH = "/api/validate-answers/batch"
+METRICS_PATH = "/metrics"
+PROFILE_PATH = "/api/admin/profile"
+
+# Resultados del lote acumulados antes de enviar un fragmento de la respuesta
+BATCH_FLUSH_ITEMS = 100
+
+# Equivalente a CORS(app) en la app Flask: cualquier origen
+CORS_HEADERS = [
+    (b"access-control-allow-origin", b"*"),
+    (b"access-control-expose-headers", b"X-Request-ID"),
+]
+
+
+async def read_json(receive):
+    """Lee el cuerpo completo; devuelve None si no es JSON válido (como get_json(silent=True))"""
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    try:
+        return json.loads(b"".join(chunks))
+    except ValueError:
+        return None
+
+
+def request_id_header():
+    return (b"x-request-id", request_id_var.get().encode("latin-1"))
+
+
+async def run_blocking(fn, *args):
+    """Ejecuta fn en el pool de hilos con el contexto actual (el ID de la petición incluido)"""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(None, context.run, fn, *args)
+
+
+async def send_json(send, payload, status, started_at=None):
+    with stage("serializacion"):
+        body = json.dumps(payload).encode("utf-8")
+    headers = [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        *CORS_HEADERS,
+        request_id_header(),
+    ]
+    if started_at is not None:
+        timing = server_timing_header(time.perf_counter() - started_at)
+        if timing is not None:
+            headers.append((b"server-timing", timing.encode("latin-1")))
+            headers.append((b"timing-allow-origin", b"*"))
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_text(send, text, status, content_type=b"text/plain; charset=utf-8"):
+    body = text.encode("utf-8")
+    headers = [
+        (b"content-type", content_type),
+        (b"content-length", str(len(body)).encode()),
+        request_id_header(),
+    ]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_preflight(send, scope):
+    requested = dict(scope["headers"]).get(b"access-control-request-headers", b"")
+    headers = [
+        *CORS_HEADERS,
+        (b"access-control-allow-methods", b"GET, POST, OPTIONS"),
+        (b"access-control-allow-headers", requested),
+        (b"content-length", b"0"),
+    ]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def _run_batch(loop, receive, send, envios):
+    """Califica un lote en un hilo del pool, leyendo y escribiendo a través del loop.
+
+    Con ``envios`` None el cuerpo es NDJSON y se lee a medida que llega; lo
+    ya calificado se envía antes de esperar más cuerpo.
+    """
+    def call(coro):
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    buffer = []
+
+    def flush():
+        if buffer:
+            body = "".join(buffer).encode("utf-8")
+            buffer.clear()
+            call(send({"type": "http.response.body", "body": body, "more_body": True}))
+
+    def body_envios():
+        pending = b""
+        more_body = True
+        while more_body:
+            flush()
+            message = call(receive())
+            pending += message.get("body", b"")
+            more_body = message.get("more_body", False)
+            *lines, pending = pending.split(b"\n")
+            yield from iter_ndjson(lines)
+        yield from iter_ndjson([pending])
+
+    for line in ndjson_lines(batch_validation(body_envios() if envios is None else envios)):
+        buffer.append(line)
+        if len(buffer) >= BATCH_FLUSH_ITEMS:
+            flush()
+    flush()
+    call(send({"type": "http.response.body", "body": b""}))
+
+
+async def validate_batch(scope, receive, send):
+    content_type = dict(scope["headers"]).get(b"content-type", b"").split(b";")[0].strip()
+    envios = None
+    if content_type != b"application/x-ndjson":
+        envios = batch_envelope(await read_json(receive))
+        if envios is None:
+            await send_json(send, {"error": "Se esperaba {\"envios\": [...]} o un cuerpo NDJSON"}, 400)
+            return 400
+
+    headers = [(b"content-type", b"application/x-ndjson"), *CORS_HEADERS, request_id_header()]
+    await send({"type": "http.response.start", "status": 200, "headers": headers})
+    await run_blocking(_run_batch, asyncio.get_running_loop(), receive, send, envios)
+    return 200
+
+
+def _warm_up():
+    try:
+        quiz = quiz_registry.get()
+        if quiz is not None:
+            quiz.bank.get()
+    except Exception as e:
+        logger.warning("No se pudo precargar el banco de preguntas: %s", e)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Precargar el banco sin retrasar el arranque del servidor
+            asyncio.get_running_loop().run_in_executor(None, _warm_up)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    incoming = dict(scope["headers"]).get(b"x-request-id")
+    new_request_id(incoming.decode("latin-1") if incoming else None)
+    started_at = time.perf_counter()
+    allow_retries(False)
+    if SERVER_TIMING:
+        start_request_timing(scope["path"] in SERVER_TIMING_PATHS)
+    status = await dispatch(scope, receive, send, started_at)
+    elapsed = time.perf_counter() - started_at
+    path = scope["path"]
+    known = path in (BATCH_PATH, METRICS_PATH, PROFILE_PATH) or any(p == path for _, p in ROUTES)
+    observe_request(path if known else "desconocido", scope["method"], status, elapsed)
+    logger.debug(
+        "%s %s -> %d", scope["method"], path, status,
+        extra={"duracion_ms": round(elapsed * 1000, 2)}
+    )
+
+
+async def dispatch(scope, receive, send, started_at):
+    """Atiende la petición y devuelve el status enviado"""
+    method, path = scope["method"], scope["path"]
+    if method == "OPTIONS" and (path == BATCH_PATH or any(p == path for _, p in ROUTES)):
+        await send_preflight(send, scope)
+        return 200
+
+    if path == METRICS_PATH and method == "GET":
+        await send_text(send, metrics.render(), 200, metrics.CONTENT_TYPE.encode())
+        return 200
+
+    if path == PROFILE_PATH and method in ("POST", "GET"):
+        token = dict(scope["headers"]).get(b"x-admin-token")
+        token = token.decode("latin-1") if token else None
+        # Solo inicia o lee la ventana: el muestreo corre en su propio hilo
+        if method == "GET":
+            pid = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("pid", [None])[-1]
+            payload, status = handle_endpoint(profile_result_response, "Error en el profiling", token, pid)
+        else:
+            payload, status = handle_endpoint(
+                profile_response, "Error en el profiling", await read_json(receive), token
+            )
+        if isinstance(payload, str):
+            await send_text(send, payload, status)
+        else:
+            await send_json(send, payload, status)
+        return status
+
+    if path == BATCH_PATH:
+        if method == "POST":
+            return await validate_batch(scope, receive, send)
+        await send_json(send, {"error": "Método no permitido"}, 405)
+        return 405
+
+    route = ROUTES.get((method, path))
+    if route is None:
+        status = 405 if any(p == path for _, p in ROUTES) else 404
+        await send_json(send, {"error": "Método no permitido" if status == 405 else "No encontrado"}, status)
+        return status
+
+    args = (await read_json(receive),) if route.has_body else ()
+    if route.blocking or (route.uses_bank and not quiz_ready(*args)):
+        payload, status = await run_blocking(handle_endpoint, route.builder, route.error_mensaje, *args)
+    else:
+        payload, status = handle_endpoint(route.builder, route.error_mensaje, *args)
+    await send_json(send, payload, status, started_at)
+    return status
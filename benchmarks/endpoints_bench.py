@@ -0,0 +1,187 @@
+"""Benchmark de los endpoints de la API contra un Google Sheets falso en proceso.
+
+Mide latencia p50/p95/p99, throughput y memoria asignada por petición para
+/api/get-questions, /api/validate-answers (con y sin token de quiz, y por
+lotes) y /api/test-connection bajo carga concurrente. Con --guardar se
+escribe el resultado en JSON, y con --comparar se falla (código 1) si algún
+p95 empeora más que --tolerancia respecto de una ejecución anterior.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.endpoints_bench --filas 5000 --latencia 0.2 --concurrencia 16
+    python -m benchmarks.endpoints_bench --guardar base.json
+    python -m benchmarks.endpoints_bench --comparar base.json --tolerancia 0.2
+"""
+import argparse
+import json
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+
+from benchmarks.fake_sheets import FakeWorksheet, install_fake
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    pos = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[pos]
+
+
+def make_requests(ids, cantidad, lote):
+    """Funciones (cliente) -> respuesta para cada endpoint"""
+    def random_answers():
+        return [{"id": qid, "respuesta": random.choice("ABCD")} for qid in random.sample(ids, cantidad)]
+
+    def get_questions(client):
+        return client.post("/api/get-questions", json={"cantidad": cantidad})
+
+    def validate_answers(client):
+        return client.post("/api/validate-answers", json={"respuestas": random_answers()})
+
+    def validate_batch(client):
+        # ``lote`` envíos por petición; la respuesta NDJSON se consume completa
+        envios = [{"id": n, "respuestas": random_answers()} for n in range(lote)]
+        response = client.post("/api/validate-answers/batch", json={"envios": envios})
+        response.get_data()
+        return response
+
+    emitido = {}
+
+    def validate_token(client):
+        # Un token emitido una vez; cada petición lo califica sin tocar el banco
+        if not emitido:
+            data = client.post("/api/get-questions", json={"cantidad": cantidad, "token": True}).get_json()
+            emitido["token"] = data["token"]
+            emitido["ids"] = [pregunta["id"] for pregunta in data["preguntas"]]
+        respuestas = [{"id": qid, "respuesta": random.choice("ABCD")} for qid in emitido["ids"]]
+        return client.post("/api/validate-answers", json={"token": emitido["token"], "respuestas": respuestas})
+
+    def test_connection(client):
+        return client.get("/api/test-connection")
+
+    return {
+        "get-questions": get_questions,
+        "validate-answers": validate_answers,
+        "validate-token": validate_token,
+        "validate-batch": validate_batch,
+        "test-connection": test_connection,
+    }
+
+
+def run_load(app, send, peticiones, concurrencia):
+    """Lanza ``peticiones`` repartidas en ``concurrencia`` hilos; devuelve latencias y duración"""
+    latencias = []
+    errores = []
+    lock = threading.Lock()
+    por_hilo = [peticiones // concurrencia + (1 if i < peticiones % concurrencia else 0)
+                for i in range(concurrencia)]
+
+    def worker(n):
+        client = app.test_client()
+        propias = []
+        for _ in range(n):
+            start = time.perf_counter()
+            response = send(client)
+            propias.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                with lock:
+                    errores.append(response.status_code)
+        with lock:
+            latencias.extend(propias)
+
+    hilos = [threading.Thread(target=worker, args=(n,)) for n in por_hilo]
+    start = time.perf_counter()
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return latencias, time.perf_counter() - start, errores
+
+
+def measure_allocations(app, send, muestras):
+    """Pico de memoria asignada por petición (KiB), medido sin concurrencia"""
+    client = app.test_client()
+    send(client)
+    picos = []
+    tracemalloc.start()
+    for _ in range(muestras):
+        base, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        send(client)
+        _, peak = tracemalloc.get_traced_memory()
+        picos.append((peak - base) / 1024)
+    tracemalloc.stop()
+    return statistics.mean(picos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=5000, help="preguntas en la hoja falsa")
+    parser.add_argument("--latencia", type=float, default=0.1, help="segundos por llamada a la API falsa")
+    parser.add_argument("--concurrencia", type=int, default=8)
+    parser.add_argument("--peticiones", type=int, default=400)
+    parser.add_argument("--cantidad", type=int, default=10, help="preguntas por petición")
+    parser.add_argument("--lote", type=int, default=100, help="envíos por petición en validate-batch")
+    parser.add_argument("--endpoints", nargs="+", default=["get-questions", "validate-answers", "validate-token", "validate-batch", "test-connection"])
+    parser.add_argument("--guardar", help="archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="resultados JSON de referencia")
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="empeoramiento de p95 permitido (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    hoja = FakeWorksheet(filas=args.filas, latency=args.latencia)
+    app = install_fake(hoja)
+    peticiones = make_requests(hoja.question_ids(), args.cantidad, args.lote)
+
+    # Primera petición con el banco vacío (arranque en frío)
+    start = time.perf_counter()
+    app.app.test_client().post("/api/get-questions", json={"cantidad": args.cantidad})
+    frio_ms = (time.perf_counter() - start) * 1000
+    print(f"Hoja falsa: {args.filas} filas, {args.latencia * 1000:.0f} ms por llamada")
+    print(f"Primera petición (banco frío): {frio_ms:.1f} ms")
+    print(f"{'endpoint':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>10}{'KiB/req':>10}{'errores':>9}")
+
+    # test-connection siempre consulta la hoja: menos peticiones para no eternizar la corrida
+    resultados = {}
+    for nombre in args.endpoints:
+        send = peticiones[nombre]
+        total = args.peticiones if nombre != "test-connection" else max(args.concurrencia, args.peticiones // 10)
+        latencias, duracion, errores = run_load(app.app, send, total, args.concurrencia)
+        kib = measure_allocations(app.app, send, muestras=20 if nombre != "test-connection" else 3)
+        resultados[nombre] = {
+            "p50_ms": percentile(latencias, 50) * 1000,
+            "p95_ms": percentile(latencias, 95) * 1000,
+            "p99_ms": percentile(latencias, 99) * 1000,
+            "req_s": len(latencias) / duracion,
+            "kib_por_peticion": kib,
+            "errores": len(errores)
+        }
+        r = resultados[nombre]
+        print(f"{nombre:<18}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['req_s']:>10.0f}{r['kib_por_peticion']:>10.1f}{r['errores']:>9}")
+    print(f"Llamadas a get_all_values: {hoja.calls}, a batch_get: {hoja.batch_calls}")
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as f:
+            json.dump({"parametros": vars(args), "resultados": resultados}, f, indent=2)
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)["resultados"]
+        regresiones = []
+        for nombre, r in resultados.items():
+            base = referencia.get(nombre)
+            if base and r["p95_ms"] > base["p95_ms"] * (1 + args.tolerancia):
+                regresiones.append(f"{nombre}: p95 {base['p95_ms']:.2f} -> {r['p95_ms']:.2f} ms")
+        if regresiones:
+            print("Regresiones detectadas:")
+            for linea in regresiones:
+                print(f"  {linea}")
+            sys.exit(1)
+        print("Sin regresiones respecto de la referencia")
+
+
+if __name__ == "__main__":
+    main()
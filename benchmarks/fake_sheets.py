@@ -0,0 +1,106 @@
+"""Backend falso de Google Sheets en proceso para benchmarks."""
+import os
+import re
+import time
+
+_RANGE = re.compile(r"A(\d+):I(\d+)")
+
+# La hoja falsa no tiene cuota: sin cupo propio para que los benchmarks no se frenen
+os.environ.setdefault("SHEETS_READS_PER_MINUTE", "0")
+
+
+class _FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+
+class FakeHTTPClient:
+    """Responde la consulta de revisión a Drive y la de metadatos (tamaño de la grilla)"""
+
+    def __init__(self, worksheet):
+        self._worksheet = worksheet
+
+    def request(self, method, url, params=None, **kwargs):
+        time.sleep(self._worksheet.latency)
+        return _FakeResponse({"version": str(self._worksheet.version), "modifiedTime": "2024-01-01T00:00:00Z"})
+
+    def fetch_sheet_metadata(self, id, params=None):
+        time.sleep(self._worksheet.latency)
+        properties = {"sheetId": self._worksheet.id, "gridProperties": {"rowCount": self._worksheet.row_count}}
+        return {"sheets": [{"properties": properties}]}
+
+
+class FakeWorksheet:
+    """Hoja con ``filas`` preguntas sintéticas y ``latency`` segundos por llamada a la API"""
+
+    spreadsheet_id = "hoja-falsa"
+    id = 0
+
+    def __init__(self, filas=1000, latency=0.0):
+        self.latency = latency
+        self.version = 1
+        self.calls = 0
+        self.batch_calls = 0
+        self.client = FakeHTTPClient(self)
+        categorias = ("Historia", "Geografía", "Ciencia", "Arte")
+        self.rows = [["ID", "Pregunta", "A", "B", "C", "D", "Respuesta", "Categoría", "Dificultad"]]
+        for i in range(filas):
+            self.rows.append([
+                f"P{i:07d}",
+                f"¿Cuál es la respuesta correcta a la pregunta {i}?",
+                f"Opción A {i}", f"Opción B {i}", f"Opción C {i}",
+                f"Opción D {i}" if i % 4 else "",
+                "ABCD"[i % 3],
+                categorias[i % len(categorias)],
+                ("facil", "media", "dificil")[i % 3]
+            ])
+
+    def get_all_values(self):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [list(row) for row in self.rows]
+
+    @property
+    def row_count(self):
+        # Como en Sheets, la grilla tiene filas vacías de sobra
+        return len(self.rows) + 100
+
+    def batch_get(self, ranges):
+        """Rangos "A<inicio>:I<fin>"; como la API, omite filas y celdas vacías del final"""
+        self.batch_calls += 1
+        time.sleep(self.latency)
+        result = []
+        for a1 in ranges:
+            first, last = map(int, _RANGE.fullmatch(a1).groups())
+            if last > self.row_count:
+                # La API responde 400 "exceeds grid limits"
+                raise ValueError(f"El rango {a1} excede la grilla de {self.row_count} filas")
+            values = [list(row) for row in self.rows[first - 1:last]]
+            for row in values:
+                while row and not row[-1]:
+                    row.pop()
+            while values and not values[-1]:
+                values.pop()
+            result.append(values)
+        return result
+
+    def question_ids(self):
+        return [row[0] for row in self.rows[1:]]
+
+
+def install_fake(worksheet):
+    """Hace que la app use ``worksheet`` en lugar de conectarse a Google Sheets"""
+    # test-connection revisa las variables antes de conectar; el secreto habilita los tokens de quiz
+    os.environ.setdefault("GOOGLE_CREDENTIALS", '{"client_email": "bench@example.com"}')
+    os.environ.setdefault("SHEET_ID", worksheet.spreadsheet_id)
+    os.environ.setdefault("QUIZ_TOKEN_SECRET", "secreto-de-benchmark")
+
+    import app
+    from sheets_client import sheets_client
+
+    sheets_client.get_worksheet = lambda: worksheet
+    app.get_google_sheet = lambda: worksheet
+    return app
@@ -0,0 +1,68 @@
+"""Compara la descarga completa (get_all_values) con la lectura por bloques.
+
+Mide tiempo, llamadas a la API y pico de memoria al construir el banco
+contra la hoja falsa; las cadenas de cada respuesta se copian para que,
+como en una descarga real, no se compartan con la hoja.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.fetch_bench --filas 100000 --bloque 5000 --por-peticion 4
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from benchmarks.fake_sheets import FakeWorksheet
+from questions import IncrementalParser
+from sheets_client import SheetsClient
+from sources import GoogleSheetsSource
+
+
+class CopyingWorksheet(FakeWorksheet):
+    """Hoja falsa que devuelve cadenas nuevas en cada respuesta"""
+
+    def get_all_values(self):
+        self.calls += 1
+        time.sleep(self.latency)
+        return [[value.encode().decode() for value in row] for row in self.rows]
+
+    def batch_get(self, ranges):
+        return [[[value.encode().decode() for value in row] for row in values]
+                for values in super().batch_get(ranges)]
+
+
+def measure(hoja, block_rows, blocks_per_request):
+    client = SheetsClient()
+    client.get_worksheet = lambda: hoja
+    source = GoogleSheetsSource(client=client, block_rows=block_rows, blocks_per_request=blocks_per_request)
+    hoja.calls = hoja.batch_calls = 0
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    questions, _ = IncrementalParser().parse_blocks(source.iter_blocks())
+    duracion = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(questions), duracion, hoja.calls + hoja.batch_calls, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--bloque", type=int, default=5000, help="filas por bloque")
+    parser.add_argument("--por-peticion", type=int, default=4, help="bloques por llamada a batch_get")
+    parser.add_argument("--latencia", type=float, default=0.0, help="segundos por llamada a la API falsa")
+    args = parser.parse_args()
+
+    hoja = CopyingWorksheet(filas=args.filas, latency=args.latencia)
+    print(f"Filas: {args.filas}")
+    print(f"{'modo':<28}{'preguntas':>10}{'ms':>9}{'llamadas':>10}{'pico MiB':>10}")
+    for nombre, bloque in (("get_all_values", 0), (f"bloques de {args.bloque}", args.bloque)):
+        preguntas, duracion, llamadas, pico = measure(hoja, bloque, args.por_peticion)
+        print(f"{nombre:<28}{preguntas:>10}{duracion * 1000:>9.1f}{llamadas:>10}{pico / 2**20:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compara la memoria del banco en formato dict original vs. Question compacta.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.memory_report --preguntas 50000
+"""
+import argparse
+import gc
+import tracemalloc
+
+from questions import parse_question_row
+
+
+def synthetic_rows(cantidad):
+    """Filas con la forma del sheet (A-G); una de cada cuatro sin opción D"""
+    rows = []
+    for i in range(cantidad):
+        rows.append([
+            f"P{i:07d}",
+            f"¿Cuál es la respuesta correcta a la pregunta número {i}?",
+            f"Opción A de la pregunta {i}",
+            f"Opción B de la pregunta {i}",
+            f"Opción C de la pregunta {i}",
+            f"Opción D de la pregunta {i}" if i % 4 else "",
+            "ABCD"[i % 4] + " "
+        ])
+    return rows
+
+
+def legacy_parse(row, row_index):
+    """Formato original: un dict por pregunta y otro por cada opción"""
+    question = parse_question_row(row, row_index)
+    return question.to_dict() if question else None
+
+
+def measure(parse, rows):
+    """Bytes retenidos por el banco construido con ``parse``"""
+    gc.collect()
+    tracemalloc.start()
+    bank = [parse(row, idx) for idx, row in enumerate(rows, start=2)]
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del bank
+    return retained
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--preguntas", type=int, default=50000)
+    args = parser.parse_args()
+
+    # Las filas existen en ambos casos; solo se mide lo que agrega cada representación
+    rows = synthetic_rows(args.preguntas)
+    dict_bytes = measure(legacy_parse, rows)
+    compact_bytes = measure(parse_question_row, rows)
+
+    print(f"Preguntas: {args.preguntas}")
+    print(f"{'representación':<16}{'total MiB':>12}{'bytes/pregunta':>18}")
+    for nombre, total in (("dict", dict_bytes), ("Question", compact_bytes)):
+        print(f"{nombre:<16}{total / 2**20:>12.2f}{total / args.preguntas:>18.1f}")
+    print(f"Ahorro: {100 * (1 - compact_bytes / dict_bytes):.1f}%")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark del parser por lotes frente al parseo fila por fila.
+
+También mide un refresco incremental: la misma hoja descargada de nuevo
+(cadenas nuevas) con ``--editadas`` filas cambiadas.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.parse_bench --filas 100000
+"""
+import argparse
+import gc
+import time
+
+from benchmarks.fake_sheets import FakeWorksheet
+from questions import IncrementalParser, parse_question_row, parse_rows
+
+
+def per_row(all_rows):
+    """Camino anterior: una llamada a parse_question_row por fila"""
+    preguntas = []
+    for idx, row in enumerate(all_rows[1:], start=2):
+        question = parse_question_row(row, idx)
+        if question:
+            preguntas.append(question)
+    return preguntas
+
+
+def fresh_copy(rows):
+    """Filas con cadenas nuevas, como las de una descarga real"""
+    return [[value.encode().decode() for value in row] for row in rows]
+
+
+def incremental(rows, editadas, repeticiones):
+    """Mejor tiempo de IncrementalParser.parse sobre una descarga con ``editadas`` filas cambiadas"""
+    parser = IncrementalParser()
+    parser.parse(fresh_copy(rows))
+    paso = max(1, (len(rows) - 1) // max(editadas, 1))
+    tiempos = []
+    for vuelta in range(repeticiones):
+        nuevas = fresh_copy(rows)
+        for i in range(1, len(nuevas), paso)[:editadas]:
+            if len(nuevas[i]) > 1:
+                nuevas[i][1] += f" (edición {vuelta})"
+        gc.collect()
+        start = time.perf_counter()
+        questions, _ = parser.parse(nuevas)
+        tiempos.append(time.perf_counter() - start)
+        if [repr(q) for q in questions] != [repr(q) for q in parse_rows(nuevas)]:
+            raise SystemExit("IncrementalParser no coincide con parse_rows")
+    return min(tiempos), parser.last_parsed
+
+
+def best_of(fn, rows, repeticiones):
+    tiempos = []
+    for _ in range(repeticiones):
+        gc.collect()
+        start = time.perf_counter()
+        fn(rows)
+        tiempos.append(time.perf_counter() - start)
+    return min(tiempos)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--filas", type=int, default=100000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--editadas", type=int, default=10, help="filas cambiadas en el refresco incremental")
+    args = parser.parse_args()
+
+    rows = FakeWorksheet(filas=args.filas).rows
+    # Algunas filas inválidas para ejercitar los descartes
+    for i in range(1, len(rows), 97):
+        rows[i] = rows[i][:5]
+
+    esperado = [repr(q) for q in per_row(rows)]
+    if [repr(q) for q in parse_rows(rows)] != esperado:
+        raise SystemExit("parse_rows no coincide con parse_question_row")
+
+    fila = best_of(per_row, rows, args.repeticiones)
+    lote = best_of(parse_rows, fresh_copy(rows), args.repeticiones)
+    inc, parseadas = incremental(rows, args.editadas, args.repeticiones)
+    print(f"Filas: {args.filas} ({len(esperado)} preguntas válidas)")
+    print(f"fila por fila: {fila * 1000:8.1f} ms  ({fila / args.filas * 1e9:6.0f} ns/fila)")
+    print(f"por lotes:     {lote * 1000:8.1f} ms  ({lote / args.filas * 1e9:6.0f} ns/fila)")
+    print(f"Aceleración: {fila / lote:.2f}x")
+    print(f"incremental:   {inc * 1000:8.1f} ms  ({parseadas} filas parseadas, {lote / inc:.2f}x frente a por lotes)")
+
+
+if __name__ == "__main__":
+    main()
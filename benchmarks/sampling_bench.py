@@ -0,0 +1,72 @@
+"""Benchmark del motor de muestreo frente al enfoque de copiar/filtrar la lista.
+
+Uso (desde la raíz del repositorio):
+
+    python -m benchmarks.sampling_bench --tamanos 1000 100000 1000000
+"""
+import argparse
+import random
+import time
+
+from question_bank import BankSnapshot
+from questions import Question
+from sampling import draw
+
+CATEGORIAS = ("Historia", "Geografía", "Ciencia", "Arte", "Deportes")
+DIFICULTADES = ("facil", "media", "dificil")
+
+
+def synthetic_bank(tamano):
+    """Banco sintético; los textos se comparten para que 1M de preguntas quepa en memoria"""
+    opciones = ("Opción A", "Opción B", "Opción C", "Opción D")
+    questions = [
+        Question(f"P{i:07d}", "¿Pregunta?", "ABCD", opciones, "A",
+                 CATEGORIAS[i % len(CATEGORIAS)], DIFICULTADES[i % len(DIFICULTADES)])
+        for i in range(tamano)
+    ]
+    return BankSnapshot(1, questions, tamano + 1, time.monotonic())
+
+
+def timeit(fn, repeticiones):
+    start = time.perf_counter()
+    for _ in range(repeticiones):
+        fn()
+    return (time.perf_counter() - start) / repeticiones * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tamanos", type=int, nargs="+", default=[1000, 100000, 1000000])
+    parser.add_argument("--cantidad", type=int, default=10)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    args = parser.parse_args()
+
+    rng = random.Random(1234)
+    k = args.cantidad
+    print(f"{'preguntas':>10} {'caso':<28}{'anterior µs':>14}{'motor µs':>12}")
+    for tamano in args.tamanos:
+        banco = synthetic_bank(tamano)
+        preguntas = banco.questions
+        # Los estratos se calculan una vez por versión del banco, fuera de la petición
+        for field in ("category", "difficulty"):
+            banco.strata(field)
+        reps = max(3, args.repeticiones * 1000 // tamano) if tamano > 1000 else args.repeticiones
+
+        casos = [
+            ("uniforme",
+             lambda: rng.sample(list(preguntas), k),
+             lambda: draw(banco, k, rng)),
+            ("filtro categoría",
+             lambda: rng.sample([q for q in preguntas if q.category == "Arte"], k),
+             lambda: draw(banco, k, rng, filters={"category": "Arte"})),
+            ("estratificado dificultad",
+             lambda: [q for d in DIFICULTADES
+                      for q in rng.sample([q for q in preguntas if q.difficulty == d], k // 3)],
+             lambda: draw(banco, k, rng, stratify_by="difficulty")),
+        ]
+        for nombre, anterior, motor in casos:
+            print(f"{tamano:>10} {nombre:<28}{timeit(anterior, reps):>14.1f}{timeit(motor, args.repeticiones):>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Configuración de pytest: su presencia agrega la raíz del repositorio a sys.path."""
@@ -0,0 +1,295 @@
+"""Métricas del proceso en formato de texto de Prometheus (GET /metrics).
+
+Contadores e histogramas sin locks en el camino caliente: cada hilo suma
+en su propio diccionario y solo ``render()`` (el scrape) recorre los de
+todos los hilos. Los de hilos que ya terminaron se acumulan aparte para
+que los totales nunca bajen, y se retiran cada vez que un hilo nuevo se
+registra: la lista no crece con cada hilo que atendió una petición.
+
+Un scrape puede ver un histograma a medio actualizar (un bucket sumado y
+el total todavía no), como cualquier lectura sin lock; la diferencia se
+corrige en el siguiente.
+
+Los valores que ya guardan otros objetos (tamaño del banco, aciertos del
+cliente de Sheets...) se exponen con ``Gauge``, que los lee al momento
+del scrape.
+
+Con SERVER_TIMING=1 las etapas medidas durante una petición de
+get-questions o validate-answers se devuelven además en la cabecera
+``Server-Timing``, visible en las herramientas de desarrollo del
+navegador. Deshabilitado, no se crea nada por petición.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+# Devolver la cabecera Server-Timing con las etapas de cada petición (0 = no)
+SERVER_TIMING = bool(int(os.environ.get('SERVER_TIMING', 0)))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Límites de los buckets en segundos
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_local = threading.local()
+_shards_lock = threading.Lock()
+# (hilo, valores) de cada hilo que registró algo
+_shards = []
+# Valores de los hilos que ya terminaron
+_retired = {}
+_metrics = []
+
+# Etapa -> segundos de la petición en curso; None si no se devuelve Server-Timing
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _values():
+    """Diccionario (métrica, etiquetas) -> valor del hilo actual"""
+    try:
+        return _local.values
+    except AttributeError:
+        values = _local.values = {}
+        with _shards_lock:
+            _retire_dead()
+            _shards.append((threading.current_thread(), values))
+        return values
+
+
+def _retire_dead():
+    """Pasa a ``_retired`` los valores de los hilos que terminaron (con ``_shards_lock`` tomado)"""
+    alive = []
+    for thread, values in _shards:
+        if thread.is_alive():
+            alive.append((thread, values))
+        else:
+            _merge(_retired, values)
+    _shards[:] = alive
+
+
+def _merge(into, values):
+    for key, value in values.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            into[key] = [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = current + value
+
+
+def _collect():
+    """Suma de todos los hilos; retira los de hilos que terminaron"""
+    with _shards_lock:
+        _retire_dead()
+        total = {}
+        _merge(total, _retired)
+        for _, values in _shards:
+            # dict.copy() es atómico con el GIL aunque el hilo dueño siga escribiendo
+            _merge(total, values.copy())
+    return total
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        _metrics.append(self)
+
+    def inc(self, *labels, amount=1):
+        values = _values()
+        key = (self, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def samples(self, collected):
+        for (metric, labels), value in collected.items():
+            if metric is self:
+                yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        _metrics.append(self)
+
+    def observe(self, value, *labels):
+        values = _values()
+        key = (self, labels)
+        cell = values.get(key)
+        if cell is None:
+            # Un contador por bucket (sin acumular), el de +Inf, la suma y el total
+            cell = values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-2] += value
+        cell[-1] += 1
+
+    def samples(self, collected):
+        bounds = self.buckets + (float("inf"),)
+        for (metric, labels), cell in collected.items():
+            if metric is not self:
+                continue
+            cumulative = 0
+            for bound, count in zip(bounds, cell):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(cell[-2])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cell[-1]}"
+
+
+class Gauge:
+    """Valor leído en cada scrape: ``read()`` devuelve pares (etiquetas, valor)"""
+
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), read=None, kind="gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.read = read
+        # Un contador que mantiene otro objeto se expone como counter
+        self.kind = kind
+        _metrics.append(self)
+
+    def samples(self, collected):
+        for labels, value in self.read():
+            if value is not None:
+                yield f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}"
+
+
+def render():
+    """Todas las métricas en formato de texto de Prometheus"""
+    collected = _collect()
+    lines = []
+    for metric in _metrics:
+        try:
+            samples = list(metric.samples(collected))
+        except Exception:
+            # Un Gauge que falla no debe tumbar el scrape
+            continue
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(samples)
+    return "\n".join(lines) + "\n"
+
+
+REQUESTS = Counter(
+    "quiz_http_requests_total", "Peticiones atendidas por endpoint, método y status",
+    ("endpoint", "metodo", "estado")
+)
+REQUEST_SECONDS = Histogram(
+    "quiz_http_request_duration_seconds", "Duración de las peticiones por endpoint", ("endpoint",)
+)
+ERRORS = Counter(
+    "quiz_errors_total", "Excepciones convertidas en respuestas de error, por función y tipo",
+    ("funcion", "tipo")
+)
+STAGE_SECONDS = Histogram(
+    "quiz_stage_duration_seconds",
+    "Duración de cada etapa interna: credenciales, abrir_hoja, descarga, parseo, muestreo, calificacion, serializacion",
+    ("etapa",)
+)
+BANK_LOOKUPS = Counter(
+    "quiz_bank_lookups_total",
+    "Consultas al banco en memoria: fresco (hit), vencido (hit que dispara un refresco) o frio (miss que espera la carga)",
+    ("resultado",)
+)
+
+
+def observe_request(endpoint, method, status, seconds):
+    REQUESTS.inc(endpoint, method, str(status))
+    REQUEST_SECONDS.observe(seconds, endpoint)
+
+
+def observe_stage(name, seconds):
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+def start_request_timing(enabled=True):
+    """Empieza (o no) a juntar las etapas de la petición actual para Server-Timing"""
+    # Los hilos de Flask reutilizan el contexto de la petición anterior: siempre se reinicia
+    _request_timings.set({} if enabled else None)
+
+
+def server_timing_header(total_seconds):
+    """Valor de la cabecera Server-Timing de la petición actual, o None si no se juntaron etapas"""
+    timings = _request_timings.get()
+    if timings is None:
+        return None
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in timings.items()]
+    entries.append(f"total;dur={total_seconds * 1000:.2f}")
+    return ", ".join(entries)
+
+
+class stage:
+    """Mide el bloque ``with`` como la etapa ``name``"""
+
+    __slots__ = ("name", "started_at")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe_stage(self.name, time.perf_counter() - self.started_at)
+
+
+class FetchClock:
+    """Acumula el tiempo que se pasa esperando el siguiente bloque de un iterador"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def wrap(self, blocks):
+        iterator = iter(blocks)
+        while True:
+            started_at = time.perf_counter()
+            try:
+                block = next(iterator)
+            except StopIteration:
+                self.seconds += time.perf_counter() - started_at
+                return
+            self.seconds += time.perf_counter() - started_at
+            yield block
+
+
+def timed_parse(parser, blocks):
+    """``parser.parse_blocks(blocks)`` registrando por separado la descarga y el parseo"""
+    clock = FetchClock()
+    started_at = time.perf_counter()
+    result = parser.parse_blocks(clock.wrap(blocks))
+    observe_stage("descarga", clock.seconds)
+    observe_stage("parseo", time.perf_counter() - started_at - clock.seconds)
+    return result
@@ -0,0 +1,199 @@
+"""Profiler estadístico para perfilar el tráfico real sin reiniciar workers.
+
+Mientras está activo, un hilo toma cada PROFILER_INTERVAL_MS la pila de
+todos los demás hilos del proceso (``sys._current_frames()``) y cuenta
+cuántas veces aparece cada una. No instrumenta el código ni cambia cómo
+corre: el costo es el del hilo muestreador, solo durante la ventana
+pedida.
+
+La ventana corre en un hilo propio: la petición que la inicia vuelve de
+inmediato y el worker sigue atendiendo tráfico (con los workers sync de
+gunicorn no queda bloqueado). Al terminar, el resultado se escribe en
+``PROFILER_DIR/profile-<pid>.collapsed``, un directorio común a los
+workers del host, así que cualquiera de ellos puede devolverlo: la
+petición que inicia la ventana responde con el pid a pedir.
+
+El resultado está en formato de pilas colapsadas (una línea
+``hilo;marco;marco... muestras`` por pila, la raíz primero), listo para
+flamegraph.pl o speedscope.
+
+Los endpoints que lo manejan exigen ADMIN_TOKEN; sin él quedan deshabilitados.
+"""
+import glob
+import hmac
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+# Token que habilita los endpoints de administración (sin configurar, deshabilitados)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Milisegundos entre muestras y duración máxima de una ventana de profiling
+PROFILER_INTERVAL_MS = float(os.environ.get('PROFILER_INTERVAL_MS', 5))
+PROFILER_MAX_SECONDS = float(os.environ.get('PROFILER_MAX_SECONDS', 25))
+
+# Directorio común a los workers donde cada proceso deja el resultado de su última ventana
+PROFILER_DIR = os.environ.get('PROFILER_DIR', tempfile.gettempdir())
+
+# Segundos de gracia tras el fin previsto de una ventana antes de darla por perdida
+# (el worker que la corría terminó sin escribir el resultado)
+_RUNNING_GRACE = 5
+
+
+class ProfilerBusy(Exception):
+    """Ya hay una ventana de profiling en curso en este proceso"""
+
+
+def admin_authorized(token, expected=ADMIN_TOKEN):
+    """True si ``token`` coincide con ADMIN_TOKEN (comparación en tiempo constante)"""
+    if not expected or not isinstance(token, str):
+        return False
+    return hmac.compare_digest(token.encode("utf-8"), expected.encode("utf-8"))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)})"
+
+
+def _stack(frame):
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class SamplingProfiler:
+    """Muestreador de pilas de todos los hilos; una ventana a la vez por proceso"""
+
+    def __init__(self, interval_ms=PROFILER_INTERVAL_MS, max_seconds=PROFILER_MAX_SECONDS, directory=PROFILER_DIR):
+        self.interval = interval_ms / 1000
+        self.max_seconds = max_seconds
+        self.directory = directory
+        # Tomado mientras hay una ventana en curso; lo libera el hilo muestreador
+        self._lock = threading.Lock()
+
+        # Contadores para monitoreo
+        self.runs = 0
+        self.samples = 0
+
+    def _path(self, pid, suffix):
+        return os.path.join(self.directory, f"profile-{pid}.{suffix}")
+
+    def start(self, seconds):
+        """Inicia en segundo plano una ventana de ``seconds`` (acotado a max_seconds).
+
+        Devuelve ``(segundos, pid)``: el resultado se pide con ese pid.
+        """
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("Ya hay un profiling en curso")
+        seconds = min(seconds, self.max_seconds)
+        pid = os.getpid()
+        try:
+            # La marca de "en curso" guarda el fin previsto de la ventana
+            _write_atomic(self._path(pid, "running"), str(time.time() + seconds))
+            threading.Thread(target=self._run, args=(seconds, pid), name="profiler", daemon=True).start()
+        except BaseException:
+            self._lock.release()
+            raise
+        return seconds, pid
+
+    def _run(self, seconds, pid):
+        try:
+            stacks, _ = self._sample(seconds)
+            _write_atomic(self._path(pid, "collapsed"), collapse(stacks))
+        finally:
+            try:
+                os.remove(self._path(pid, "running"))
+            except OSError:
+                pass
+            self._lock.release()
+
+    def running(self):
+        return self._lock.locked()
+
+    def result(self, pid=None):
+        """Estado de la ventana del proceso ``pid`` (o de la última terminada en el host).
+
+        Devuelve ``("en curso", None)``, ``("terminado", pilas colapsadas)``
+        o ``(None, None)`` si no hay ninguna.
+        """
+        if pid is None:
+            finished = glob.glob(os.path.join(glob.escape(self.directory), "profile-*.collapsed"))
+            if not finished:
+                return None, None
+            path = max(finished, key=_mtime)
+        else:
+            try:
+                with open(self._path(pid, "running"), encoding="utf-8") as f:
+                    ends_at = float(f.read())
+            except (OSError, ValueError):
+                ends_at = None
+            if ends_at is not None and time.time() < ends_at + _RUNNING_GRACE:
+                return "en curso", None
+            path = self._path(pid, "collapsed")
+        try:
+            with open(path, encoding="utf-8") as f:
+                return "terminado", f.read()
+        except FileNotFoundError:
+            return None, None
+
+    def _sample(self, seconds):
+        stacks = Counter()
+        own_id = threading.get_ident()
+        names = {}
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            frames = sys._current_frames()
+            if not frames.keys() <= names.keys():
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                thread_name = names.get(thread_id, str(thread_id)).replace(";", ":")
+                stacks[";".join([thread_name, *_stack(frame)])] += 1
+            del frames
+            samples += 1
+            time.sleep(self.interval)
+        self.runs += 1
+        self.samples += samples
+        return stacks, samples
+
+    def stats(self):
+        return {
+            "intervalo_ms": self.interval * 1000,
+            "maximo_segundos": self.max_seconds,
+            "directorio": self.directory,
+            "en_curso": self.running(),
+            "ejecuciones": self.runs,
+            "muestras": self.samples
+        }
+
+
+def collapse(stacks):
+    """Pilas colapsadas, de la más a la menos frecuente"""
+    return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+def _write_atomic(path, text):
+    # Quien lee nunca ve un archivo a medio escribir
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+sampling_profiler = SamplingProfiler()
@@ -0,0 +1,267 @@
+import logging
+import os
+import threading
+import time
+
+from metrics import BANK_LOOKUPS
+from sampling import build_strata
+from singleflight import SingleFlight
+from snapshot_file import read_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+# Segundos durante los que una versión del banco se considera fresca
+QUESTIONS_CACHE_TTL = float(os.environ.get('QUESTIONS_CACHE_TTL', 300))
+
+# Archivo local con la última versión del banco para arrancar sin esperar a Sheets
+QUESTIONS_SNAPSHOT_PATH = os.environ.get('QUESTIONS_SNAPSHOT_PATH')
+
+# Espera máxima antes de reintentar un refresco que falló
+REFRESH_RETRY_INTERVAL = 30
+
+
+def build_index(questions):
+    """Índice ID -> pregunta; si un ID se repite gana la última fila, como en el sheet"""
+    return {question.id: question for question in questions}
+
+
+def apply_changes(index, questions, changes):
+    """Actualiza una copia de ``index`` solo con las preguntas que cambiaron.
+
+    Devuelve None cuando no es seguro hacerlo (IDs repetidos, antes o
+    después) y hay que reconstruir el índice completo.
+    """
+    if type(index) is not dict or len(index) != len(changes.base):
+        return None
+    updated = dict(index)
+    for question in changes.removed:
+        if updated.get(question.id) is question:
+            del updated[question.id]
+    for question in changes.upserted:
+        updated[question.id] = question
+    if len(updated) != len(questions):
+        return None
+    return updated
+
+
+class BankSnapshot:
+    """Versión inmutable del banco de preguntas ya parseado.
+
+    El índice por ID se construye una sola vez por versión (en el hilo que
+    refresca, no en las peticiones) y lo comparten todas las validaciones.
+    Los estratos por categoría/dificultad se calculan la primera vez que se
+    piden y también se reutilizan mientras dure la versión.
+    """
+
+    __slots__ = ("version", "questions", "index", "total_rows", "loaded_at", "revision", "_strata")
+
+    def __init__(self, version, questions, total_rows, loaded_at, revision=None, index=None, strata=None):
+        self.version = version
+        self.questions = questions
+        self.index = build_index(questions) if index is None else index
+        self.total_rows = total_rows
+        self.loaded_at = loaded_at
+        self.revision = revision
+        self._strata = {} if strata is None else strata
+
+    def strata(self, field):
+        """Posiciones del banco agrupadas por el valor de ``field``"""
+        strata = self._strata.get(field)
+        if strata is None:
+            strata = self._strata[field] = build_strata(self.questions, field)
+        return strata
+
+
+class QuestionBank:
+    """Caché en memoria del banco de preguntas.
+
+    La primera petición carga el banco de forma bloqueante. A partir de ahí
+    siempre se sirve la versión en memoria, y cuando supera el TTL se
+    refresca en un hilo de fondo (stale-while-revalidate), de modo que las
+    peticiones nunca esperan a la API de Google Sheets.
+
+    ``loader`` es una función sin argumentos que devuelve
+    ``(preguntas, filas_totales)`` o ``(preguntas, filas_totales, cambios)``
+    con los RowChanges de un IncrementalParser; en ese caso el índice de la
+    versión anterior se actualiza en lugar de reconstruirse.
+
+    Si se indica ``get_revision``, antes de cada refresco se consulta la
+    revisión del documento y solo se vuelve a descargar cuando cambió.
+
+    Con ``snapshot_path`` cada versión descargada se guarda en disco, y
+    ``load_snapshot()`` permite arrancar sirviendo esa copia mientras el
+    primer refresco la actualiza en segundo plano.
+
+    Los refrescos concurrentes (arranque en frío con muchas peticiones,
+    refresco de fondo y refrescos forzados) se agrupan en una sola descarga.
+    """
+
+    def __init__(self, loader, ttl=QUESTIONS_CACHE_TTL, get_revision=None,
+                 snapshot_path=QUESTIONS_SNAPSHOT_PATH):
+        self._loader = loader
+        self._get_revision = get_revision
+        self.ttl = ttl
+        self.snapshot_path = snapshot_path
+        self._snapshot = None
+        self._flight = SingleFlight()
+        self._state_lock = threading.Lock()
+        self._refreshing = False
+        self._last_attempt = 0.0
+        self._version = 0
+
+        # Contadores para monitoreo
+        self.refreshes = 0
+        self.skipped_refreshes = 0
+        self.refresh_errors = 0
+        self.incremental_indexes = 0
+        self.last_error = None
+        self.loaded_from_snapshot = False
+
+    @property
+    def ready(self):
+        """True si ya hay una versión cargada y get() no bloqueará"""
+        return self._snapshot is not None
+
+    def get(self):
+        """Devuelve la versión actual del banco sin bloquear tras el arranque"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            BANK_LOOKUPS.inc("frio")
+            return self._load_blocking()
+        if time.monotonic() - snapshot.loaded_at < self.ttl:
+            BANK_LOOKUPS.inc("fresco")
+            return snapshot
+        BANK_LOOKUPS.inc("vencido")
+        if self._needs_refresh(snapshot):
+            self._refresh_in_background()
+        return snapshot
+
+    def _needs_refresh(self, snapshot):
+        now = time.monotonic()
+        if now - snapshot.loaded_at < self.ttl:
+            return False
+        # Tras un fallo no se reintenta en cada petición
+        return now - self._last_attempt >= min(self.ttl, REFRESH_RETRY_INTERVAL)
+
+    def _load_blocking(self):
+        if self._snapshot is None:
+            self.refresh()
+        return self._snapshot
+
+    def _refresh_in_background(self):
+        with self._state_lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        thread = threading.Thread(target=self._run_refresh, name="question-bank-refresh", daemon=True)
+        thread.start()
+
+    def _run_refresh(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            # Se sigue sirviendo la versión anterior (también si Sheets está limitando las lecturas)
+            logger.warning("Error refrescando el banco de preguntas: %s", e, exc_info=True)
+        finally:
+            with self._state_lock:
+                self._refreshing = False
+
+    def load_snapshot(self):
+        """Publica el banco guardado en disco, marcado como vencido para que se refresque"""
+        if not self.snapshot_path or self._snapshot is not None:
+            return False
+        data = read_snapshot(self.snapshot_path)
+        if data is None:
+            return False
+
+        header, questions = data
+        with self._state_lock:
+            if self._snapshot is not None:
+                return False
+            self._version += 1
+            self._snapshot = BankSnapshot(
+                self._version, questions, header.get("filas_totales", 0),
+                time.monotonic() - self.ttl, header.get("revision")
+            )
+            self.loaded_from_snapshot = True
+        logger.info("Banco cargado desde %s: %d preguntas", self.snapshot_path, len(questions))
+        return True
+
+    def _save_snapshot(self, snapshot):
+        if not self.snapshot_path:
+            return
+        try:
+            write_snapshot(self.snapshot_path, snapshot)
+        except OSError as e:
+            logger.warning("No se pudo guardar el snapshot del banco: %s", e)
+
+    def _current_revision(self):
+        if self._get_revision is None:
+            return None
+        try:
+            return self._get_revision()
+        except Exception as e:
+            # Sin revisión no se puede saber si cambió: se descarga completo
+            logger.warning("No se pudo consultar la revisión del documento: %s", e)
+            return None
+
+    def refresh(self):
+        """Carga una nueva versión del banco y la publica (una sola descarga a la vez)"""
+        return self._flight.do("refresh", self._do_refresh)
+
+    def _do_refresh(self):
+        self._last_attempt = time.monotonic()
+        revision = self._current_revision()
+
+        current = self._snapshot
+        if current is not None and revision is not None and revision == current.revision:
+            # El documento no cambió: se renueva la vigencia sin descargar filas
+            with self._state_lock:
+                self._snapshot = BankSnapshot(
+                    current.version, current.questions, current.total_rows, time.monotonic(),
+                    revision, index=current.index, strata=current._strata
+                )
+                self.skipped_refreshes += 1
+            return self._snapshot
+
+        try:
+            questions, total_rows, *changes = self._loader()
+        except Exception as e:
+            self.refresh_errors += 1
+            self.last_error = f"{type(e).__name__}: {str(e)}"
+            raise
+
+        index = None
+        changes = changes[0] if changes else None
+        if changes is not None and current is not None and changes.base is current.questions:
+            index = apply_changes(current.index, questions, changes)
+            if index is not None:
+                self.incremental_indexes += 1
+
+        with self._state_lock:
+            self._version += 1
+            snapshot = BankSnapshot(self._version, questions, total_rows, time.monotonic(), revision, index=index)
+            self._snapshot = snapshot
+            self.refreshes += 1
+        self._save_snapshot(snapshot)
+        return snapshot
+
+    def stats(self):
+        """Contadores del banco para monitoreo"""
+        snapshot = self._snapshot
+        return {
+            "version": snapshot.version if snapshot else None,
+            "preguntas": len(snapshot.questions) if snapshot else 0,
+            "edad_segundos": round(time.monotonic() - snapshot.loaded_at, 1) if snapshot else None,
+            "ttl_segundos": self.ttl,
+            "revision": snapshot.revision if snapshot else None,
+            "refrescos": self.refreshes,
+            "refrescos_omitidos": self.skipped_refreshes,
+            "errores_refresco": self.refresh_errors,
+            "indices_incrementales": self.incremental_indexes,
+            "ultimo_error": self.last_error,
+            "refresco_en_curso": self._flight.in_flight("refresh"),
+            "descargas_agrupadas": self._flight.coalesced,
+            "snapshot": self.snapshot_path,
+            "cargado_desde_snapshot": self.loaded_from_snapshot
+        }
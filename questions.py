@@ -0,0 +1,323 @@
+import gc
+import sys
+import threading
+from itertools import islice
+
+# Columnas C, D, E, F del sheet
+OPTION_CODES = ("A", "B", "C", "D")
+
+# Códigos internados según la máscara de opciones presentes (bit 0 = A ... bit 3 = D)
+_CODES_BY_MASK = tuple(
+    sys.intern("".join(code for bit, code in enumerate(OPTION_CODES) if mask >> bit & 1))
+    for mask in range(16)
+)
+
+# Máscaras con menos de 2 opciones (fila inválida)
+_TOO_FEW_OPTIONS = frozenset(mask for mask in range(16) if bin(mask).count("1") < 2)
+
+
+class Question:
+    """Pregunta en representación compacta.
+
+    En lugar de un dict por pregunta y otro por cada opción, guarda los
+    textos de las opciones en una tupla y sus códigos en una sola cadena
+    internada ("ABD" si la opción C está vacía), compartida por todas las
+    preguntas con las mismas opciones. La forma JSON de la API se construye
+    solo al responder.
+
+    ``category`` y ``difficulty`` vienen de las columnas H e I; son cadena
+    vacía cuando el sheet no las tiene.
+    """
+
+    __slots__ = ("id", "text", "codes", "options", "answer", "category", "difficulty")
+
+    def __init__(self, id, text, codes, options, answer, category="", difficulty=""):
+        self.id = id
+        self.text = text
+        self.codes = codes
+        self.options = options
+        self.answer = answer
+        self.category = category
+        self.difficulty = difficulty
+
+    def option_dicts(self, order=None):
+        """Opciones en formato de la API, opcionalmente en el orden indicado"""
+        if order is None:
+            order = range(len(self.options))
+        codes = self.codes
+        options = self.options
+        return [{"codigo": codes[i], "texto": options[i]} for i in order]
+
+    def to_public(self, order=None):
+        """Pregunta tal como se envía al cliente (sin la respuesta correcta)"""
+        return {
+            "id": self.id,
+            "pregunta": self.text,
+            "opciones": self.option_dicts(order)
+        }
+
+    def to_dict(self):
+        """Pregunta completa en el formato de diccionario original"""
+        return {
+            "id": self.id,
+            "pregunta": self.text,
+            "opciones": self.option_dicts(),
+            "respuesta_correcta": self.answer
+        }
+
+    def __repr__(self):
+        return (
+            f"Question({self.id!r}, {self.text!r}, {self.codes!r}, {self.options!r}, "
+            f"{self.answer!r}, {self.category!r}, {self.difficulty!r})"
+        )
+
+
+def parse_question_row(row, row_index):
+    """Parsea una fila del sheet a formato de pregunta"""
+    if len(row) < 7:  # Necesitamos al menos columnas A-G
+        return None
+
+    # Columna A: ID (si está vacía, usar índice de fila)
+    question_id = row[0] if row[0] else f"pregunta_{row_index}"
+
+    # Columna B: Pregunta
+    question_text = row[1]
+    if not question_text:
+        return None
+
+    # Columnas C, D, E, F: Opciones (filtrando las vacías)
+    codes = ""
+    options = []
+    for code, texto in zip(OPTION_CODES, row[2:6]):
+        if texto:
+            codes += code
+            options.append(texto)
+
+    if len(options) < 2:  # Al menos 2 opciones
+        return None
+
+    # Columna G: Respuesta correcta
+    respuesta_correcta = row[6]
+
+    # Columnas H, I: Categoría y dificultad (opcionales, pocos valores distintos)
+    categoria = row[7].strip() if len(row) > 7 else ""
+    dificultad = row[8].strip() if len(row) > 8 else ""
+
+    return Question(
+        question_id,
+        question_text,
+        sys.intern(codes),
+        tuple(options),
+        sys.intern(respuesta_correcta.strip().upper()),
+        sys.intern(categoria),
+        sys.intern(dificultad)
+    )
+
+
+def parse_rows(all_rows):
+    """Parsea todas las filas del sheet (saltando el encabezado) y descarta las inválidas"""
+    parsed = parse_block(enumerate(islice(all_rows, 1, None), start=2))
+    return [question for question in parsed if question is not None]
+
+
+def parse_block(numbered_rows):
+    """Parsea pares (número de fila, fila) en una sola pasada.
+
+    Devuelve una lista alineada con la entrada, con None en las filas
+    inválidas. Produce lo mismo que llamar a parse_question_row fila por
+    fila, pero sin una llamada por fila: las opciones presentes se
+    codifican en una máscara de 4 bits que indexa los códigos ya
+    internados, y las respuestas, categorías y dificultades (pocos valores
+    distintos) se normalizan una sola vez por valor. El GC se pausa
+    mientras se crean los objetos.
+    """
+    codes_by_mask = _CODES_BY_MASK
+    too_few = _TOO_FEW_OPTIONS
+    answers = {}
+    labels = {"": ""}
+    preguntas = []
+    append = preguntas.append
+
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for idx, row in numbered_rows:
+            if len(row) < 7 or not row[1]:
+                append(None)
+                continue
+            question_text = row[1]
+
+            a, b, c, d = row[2:6]
+            mask = (a != "") | (b != "") << 1 | (c != "") << 2 | (d != "") << 3
+            if mask in too_few:
+                append(None)
+                continue
+            options = (a, b, c, d) if mask == 15 else tuple(t for t in (a, b, c, d) if t)
+
+            raw = row[6]
+            answer = answers.get(raw)
+            if answer is None:
+                answer = answers[raw] = sys.intern(raw.strip().upper())
+
+            category = difficulty = ""
+            if len(row) > 7:
+                category = labels.get(row[7])
+                if category is None:
+                    category = labels[row[7]] = sys.intern(row[7].strip())
+                if len(row) > 8:
+                    difficulty = labels.get(row[8])
+                    if difficulty is None:
+                        difficulty = labels[row[8]] = sys.intern(row[8].strip())
+
+            append(Question(
+                row[0] or f"pregunta_{idx}", question_text, codes_by_mask[mask],
+                options, answer, category, difficulty
+            ))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return preguntas
+
+
+class RowChanges:
+    """Diferencias entre un parseo y el anterior del mismo IncrementalParser.
+
+    ``base`` es la lista de preguntas del parseo anterior, ``removed`` las
+    preguntas de esa lista que ya no están y ``upserted`` las recién
+    parseadas (filas agregadas o modificadas), en orden de fila.
+    """
+
+    __slots__ = ("base", "removed", "upserted", "added", "modified", "reused")
+
+    def __init__(self, base, removed, upserted, reused):
+        self.base = base
+        self.removed = removed
+        self.upserted = upserted
+        self.reused = reused
+        removed_ids = {question.id for question in removed}
+        self.modified = sum(1 for question in upserted if question.id in removed_ids)
+        self.added = len(upserted) - self.modified
+
+
+class IncrementalParser:
+    """Parsea el sheet reutilizando las preguntas de las filas que no cambiaron.
+
+    Cada fila se identifica por el hash de su contenido; si en la descarga
+    anterior ya produjo una pregunta con el mismo texto e ID, se reutiliza
+    el mismo objeto. Solo las filas nuevas o editadas pasan por
+    parse_block, y ``parse()`` devuelve además los cambios para que el
+    banco actualice su índice sin reconstruirlo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_hash = {}
+        self._questions = None
+        self.parses = 0
+        self.last_rows = 0
+        self.last_parsed = 0
+        self.last_reused = 0
+        # Acumulados desde el arranque, para monitoreo
+        self.total_parsed = 0
+        self.total_reused = 0
+        self.last_changes = None
+
+    def parse(self, all_rows):
+        """Devuelve ``(preguntas, cambios)``; ``cambios`` es None en el primer parseo"""
+        return self.parse_blocks([(1, all_rows)])
+
+    def parse_blocks(self, blocks):
+        """Como parse(), pero recibe las filas por bloques ``(número de la primera fila, filas)``.
+
+        Cada bloque se parsea apenas llega, así que nunca se retienen más
+        filas crudas que las de un bloque.
+        """
+        with self._lock:
+            return self._parse(blocks)
+
+    def _parse(self, blocks):
+        # Las preguntas reutilizadas salen de ``previous``: lo que quede son las eliminadas.
+        # Si algo falla a mitad de camino el próximo parseo será completo.
+        previous = self._by_hash
+        base = self._questions
+        self._by_hash = {}
+        self._questions = None
+
+        by_hash = {}
+        questions = []
+        discarded = []
+        upserted = []
+        parsed_rows = reused = last_row = 0
+
+        for start, rows in blocks:
+            if rows:
+                last_row = max(last_row, start + len(rows) - 1)
+            if start == 1:
+                # Encabezado
+                rows = islice(rows, 1, None)
+                start = 2
+            slots = []
+            pending = []
+            append = slots.append
+
+            gc_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                for idx, row in enumerate(rows, start=start):
+                    key = hash(tuple(row))
+                    question = previous.pop(key, None) or by_hash.get(key)
+                    # El texto y el ID descartan colisiones de hash y filas sin ID que cambiaron de lugar
+                    if question is not None and question.text == row[1] and \
+                            question.id == (row[0] or f"pregunta_{idx}"):
+                        by_hash[key] = question
+                        append(question)
+                    else:
+                        if question is not None and by_hash.get(key) is not question:
+                            discarded.append(question)
+                        pending.append((len(slots), key))
+                        append((idx, row))
+            finally:
+                if gc_enabled:
+                    gc.enable()
+
+            parsed_rows += len(pending)
+            reused += len(slots) - len(pending)
+            if pending:
+                parsed = parse_block(slots[pos] for pos, _ in pending)
+                for (pos, key), question in zip(pending, parsed):
+                    slots[pos] = question
+                    if question is not None:
+                        by_hash.setdefault(key, question)
+                        upserted.append(question)
+                questions.extend(question for question in slots if question is not None)
+            else:
+                questions.extend(slots)
+
+        changes = None
+        if base is not None:
+            changes = RowChanges(base, discarded + list(previous.values()), upserted, reused)
+
+        self._by_hash = by_hash
+        self._questions = questions
+        self.parses += 1
+        self.last_rows = last_row
+        self.last_parsed = parsed_rows
+        self.last_reused = reused
+        self.total_parsed += parsed_rows
+        self.total_reused += reused
+        self.last_changes = changes
+        return questions, changes
+
+    def stats(self):
+        changes = self.last_changes
+        return {
+            "parseos": self.parses,
+            "filas_parseadas": self.last_parsed,
+            "filas_reutilizadas": self.last_reused,
+            "filas_parseadas_total": self.total_parsed,
+            "filas_reutilizadas_total": self.total_reused,
+            "agregadas": changes.added if changes else None,
+            "modificadas": changes.modified if changes else None,
+            "eliminadas": len(changes.removed) - changes.modified if changes else None
+        }
+
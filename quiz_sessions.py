@@ -0,0 +1,300 @@
+"""Sesiones de quiz guardadas en el servidor.
+
+Con QUIZ_SESSION_STORE configurado, cada llamada a get-questions registra
+una sesión con los IDs entregados, el orden en que se mezclaron sus
+opciones, la clave de respuestas y la hora de emisión, y devuelve su ID.
+validate-answers con ``sesion`` califica solo contra esas preguntas (sin
+consultar el banco) y la primera entrega queda registrada: las siguientes
+reciben el mismo resultado sin volver a calificar.
+
+- ``memory``: diccionario del proceso con vencimiento por TTL y un máximo
+  de QUIZ_SESSION_MAX sesiones. Con varios workers cada uno tiene las suyas.
+- ``redis``: servidor Redis (o compatible) en REDIS_URL, compartido por
+  todos los workers; requiere el paquete ``redis``.
+"""
+import json
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from quiz_tokens import IssuedAnswer
+
+# Backend de sesiones: memory o redis (sin configurar, no se crean sesiones)
+QUIZ_SESSION_STORE = os.environ.get('QUIZ_SESSION_STORE')
+
+# Segundos de vida de una sesión y máximo de sesiones en memoria
+QUIZ_SESSION_TTL = int(os.environ.get('QUIZ_SESSION_TTL', 3600))
+QUIZ_SESSION_MAX = int(os.environ.get('QUIZ_SESSION_MAX', 100000))
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+
+class QuizSession:
+    """Preguntas entregadas en una llamada a get-questions"""
+
+    __slots__ = ("session_id", "quiz_id", "ids", "answers", "orders", "issued_at")
+
+    def __init__(self, session_id, quiz_id, ids, answers, orders, issued_at):
+        self.session_id = session_id
+        self.quiz_id = quiz_id
+        self.ids = ids
+        self.answers = answers
+        self.orders = orders
+        self.issued_at = issued_at
+
+    @classmethod
+    def create(cls, quiz_id, questions, orders):
+        return cls(
+            secrets.token_urlsafe(16), quiz_id,
+            [question.id for question in questions], [question.answer for question in questions],
+            orders, time.time()
+        )
+
+    def answer_index(self):
+        """Índice ID -> respuesta con la interfaz que usa score_answers"""
+        return {question_id: IssuedAnswer(question_id, answer) for question_id, answer in zip(self.ids, self.answers)}
+
+    def to_json(self):
+        return json.dumps({
+            "quiz": self.quiz_id,
+            "ids": self.ids,
+            "respuestas": self.answers,
+            "orden": self.orders,
+            "emitida": self.issued_at
+        }, ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, session_id, raw):
+        data = json.loads(raw)
+        return cls(session_id, data["quiz"], data["ids"], data["respuestas"], data["orden"], data["emitida"])
+
+
+class SessionStore:
+    """Interfaz de los backends de sesiones.
+
+    ``claim()`` devuelve True solo para la primera entrega de una sesión;
+    ``release()`` la deshace si la calificación falla. Los backends
+    implementan ``_save``, ``_get`` y ``_save_result``; los métodos públicos
+    llevan además los contadores.
+    """
+
+    kind = None
+    # True si cada operación sale a la red (la variante ASGI la saca del loop)
+    blocking = False
+
+    def __init__(self):
+        self._counters_lock = threading.Lock()
+
+        # Contadores para monitoreo
+        self.created = 0
+        self.validated = 0
+        self.duplicates = 0
+        self.not_found = 0
+
+    def _count(self, counter):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def save(self, session):
+        self._save(session)
+        self._count("created")
+
+    def get(self, session_id):
+        """Sesión vigente con ese ID, o None (y cuenta como no encontrada)"""
+        session = self._get(session_id)
+        if session is None:
+            self._count("not_found")
+        return session
+
+    def save_result(self, session_id, result):
+        """Guarda el resultado de la primera entrega, ya calificada"""
+        self._save_result(session_id, result)
+        self._count("validated")
+
+    def duplicate_result(self, session_id):
+        """Resultado de la primera entrega para una entrega repetida; None si aún se está calificando"""
+        result = self.get_result(session_id)
+        if result is not None:
+            self._count("duplicates")
+        return result
+
+    def _save(self, session):
+        raise NotImplementedError
+
+    def _get(self, session_id):
+        raise NotImplementedError
+
+    def claim(self, session_id):
+        raise NotImplementedError
+
+    def release(self, session_id):
+        raise NotImplementedError
+
+    def _save_result(self, session_id, result):
+        raise NotImplementedError
+
+    def get_result(self, session_id):
+        raise NotImplementedError
+
+    def active(self):
+        return None
+
+    def stats(self):
+        return {
+            "tipo": self.kind,
+            "activas": self.active(),
+            "creadas": self.created,
+            "validadas": self.validated,
+            "duplicadas": self.duplicates,
+            "no_encontradas": self.not_found
+        }
+
+
+class _MemoryEntry:
+    __slots__ = ("session", "expires_at", "claimed", "result")
+
+    def __init__(self, session, expires_at):
+        self.session = session
+        self.expires_at = expires_at
+        self.claimed = False
+        self.result = None
+
+
+class MemorySessionStore(SessionStore):
+    """Sesiones en memoria del proceso.
+
+    Todas viven lo mismo, así que el orden de inserción es también el de
+    vencimiento: la limpieza solo recorre las que ya vencieron.
+    """
+
+    kind = "memory"
+
+    def __init__(self, ttl=QUIZ_SESSION_TTL, max_sessions=QUIZ_SESSION_MAX):
+        super().__init__()
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.evicted = 0
+
+    def _purge(self, now):
+        entries = self._entries
+        while entries:
+            entry = next(iter(entries.values()))
+            if entry.expires_at > now and len(entries) <= self.max_sessions:
+                break
+            entries.popitem(last=False)
+            self.evicted += 1
+
+    def _entry(self, session_id):
+        entry = self._entries.get(session_id)
+        if entry is None or entry.expires_at <= time.monotonic():
+            return None
+        return entry
+
+    def _save(self, session):
+        now = time.monotonic()
+        with self._lock:
+            self._entries[session.session_id] = _MemoryEntry(session, now + self.ttl)
+            self._purge(now)
+
+    def _get(self, session_id):
+        with self._lock:
+            entry = self._entry(session_id)
+            return entry.session if entry else None
+
+    def claim(self, session_id):
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is None or entry.claimed:
+                return False
+            entry.claimed = True
+            return True
+
+    def release(self, session_id):
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is not None:
+                entry.claimed = False
+
+    def _save_result(self, session_id, result):
+        with self._lock:
+            entry = self._entry(session_id)
+            if entry is not None:
+                entry.result = result
+
+    def get_result(self, session_id):
+        with self._lock:
+            entry = self._entry(session_id)
+            return entry.result if entry else None
+
+    def active(self):
+        with self._lock:
+            self._purge(time.monotonic())
+            return len(self._entries)
+
+    def stats(self):
+        stats = super().stats()
+        stats["descartadas"] = self.evicted
+        return stats
+
+
+class RedisSessionStore(SessionStore):
+    """Sesiones en Redis; cada clave vence sola con el TTL de la sesión.
+
+    ``active()`` devuelve None: contarlas exigiría recorrer todo el prefijo
+    en cada scrape de /metrics, así que quiz_sessions_active no se exporta
+    con este backend.
+    """
+
+    kind = "redis"
+    blocking = True
+
+    def __init__(self, url=REDIS_URL, ttl=QUIZ_SESSION_TTL, client=None, prefix="quiz:sesion:"):
+        super().__init__()
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise ValueError("QUIZ_SESSION_STORE=redis requiere el paquete redis (pip install redis)")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def _key(self, session_id, suffix=""):
+        return f"{self.prefix}{session_id}{suffix}"
+
+    def _save(self, session):
+        self.client.set(self._key(session.session_id), session.to_json(), ex=self.ttl)
+
+    def _get(self, session_id):
+        raw = self.client.get(self._key(session_id))
+        return QuizSession.from_json(session_id, raw) if raw is not None else None
+
+    def claim(self, session_id):
+        # SET NX: solo un worker gana la primera entrega
+        return bool(self.client.set(self._key(session_id, ":entrega"), "1", nx=True, ex=self.ttl))
+
+    def release(self, session_id):
+        self.client.delete(self._key(session_id, ":entrega"))
+
+    def _save_result(self, session_id, result):
+        self.client.set(self._key(session_id, ":resultado"), json.dumps(result, ensure_ascii=False), ex=self.ttl)
+
+    def get_result(self, session_id):
+        raw = self.client.get(self._key(session_id, ":resultado"))
+        return json.loads(raw) if raw is not None else None
+
+
+def session_store_from_env(kind=QUIZ_SESSION_STORE):
+    """Crea el backend configurado en QUIZ_SESSION_STORE, o None si no hay sesiones"""
+    if not kind:
+        return None
+    if kind == "memory":
+        return MemorySessionStore()
+    if kind == "redis":
+        return RedisSessionStore()
+    raise ValueError(f"QUIZ_SESSION_STORE desconocido: {kind} (opciones: memory, redis)")
@@ -0,0 +1,137 @@
+"""Tokens firmados con las preguntas entregadas y su clave de respuestas.
+
+Con QUIZ_TOKEN_SECRET configurado, get-questions puede devolver un token
+que validate-answers califica por sí solo, sin consultar el banco ni
+Google Sheets: validar pasa a ser solo CPU y cualquier worker (o réplica
+con el mismo secreto) puede hacerlo.
+
+El token es ``base64(cuerpo).base64(firma)``: el cuerpo es JSON con el
+quiz, las fechas de emisión y vencimiento, los IDs entregados y la clave de
+respuestas cifrada (XOR con un flujo HMAC-SHA256 derivado del secreto y un
+nonce aleatorio), y la firma es HMAC-SHA256 del cuerpo. El cliente ve los
+IDs pero no las respuestas, y no puede alterar nada sin invalidar la firma.
+Al no guardar estado, un mismo token puede enviarse más de una vez hasta
+que vence.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from collections import namedtuple
+
+QUIZ_TOKEN_SECRET = os.environ.get('QUIZ_TOKEN_SECRET')
+
+# Segundos de validez de un token desde que se emite
+QUIZ_TOKEN_TTL = int(os.environ.get('QUIZ_TOKEN_TTL', 3600))
+
+TOKEN_VERSION = 1
+_NONCE_BYTES = 16
+
+# Misma interfaz que Question para score_answers (solo se usa ``answer``)
+IssuedAnswer = namedtuple("IssuedAnswer", "id answer")
+
+TokenClaims = namedtuple("TokenClaims", "quiz_id issued_at expires_at answers")
+
+
+class InvalidToken(Exception):
+    """Token mal formado, alterado, firmado con otro secreto o vencido"""
+
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+class QuizTokenSigner:
+    """Emite y verifica tokens de quiz con claves derivadas de ``secret``"""
+
+    def __init__(self, secret, ttl=QUIZ_TOKEN_TTL):
+        if isinstance(secret, str):
+            secret = secret.encode("utf-8")
+        # Claves distintas para firmar y para cifrar
+        self._mac_key = hmac.new(secret, b"quiz-token:firma", hashlib.sha256).digest()
+        self._cipher_key = hmac.new(secret, b"quiz-token:cifrado", hashlib.sha256).digest()
+        self.ttl = ttl
+
+        # Contadores para monitoreo
+        self.issued = 0
+        self.verified = 0
+        self.rejected = 0
+
+    def _xor(self, data, nonce):
+        """Cifra o descifra ``data`` con el flujo HMAC(clave, nonce || contador)"""
+        stream = b"".join(
+            hmac.new(self._cipher_key, nonce + counter.to_bytes(4, "big"), hashlib.sha256).digest()
+            for counter in range((len(data) + 31) // 32)
+        )
+        mixed = int.from_bytes(data, "big") ^ int.from_bytes(stream[:len(data)], "big")
+        return mixed.to_bytes(len(data), "big")
+
+    def _sign(self, body):
+        return hmac.new(self._mac_key, body, hashlib.sha256).digest()
+
+    def issue(self, quiz_id, questions, now=None):
+        """Token para las preguntas entregadas, en el orden en que se entregaron"""
+        now = int(time.time() if now is None else now)
+        nonce = os.urandom(_NONCE_BYTES)
+        answer_key = json.dumps([question.answer for question in questions], separators=(",", ":")).encode("utf-8")
+        body = json.dumps({
+            "v": TOKEN_VERSION,
+            "quiz": quiz_id,
+            "iat": now,
+            "exp": now + self.ttl,
+            "ids": [question.id for question in questions],
+            "n": _b64encode(nonce),
+            "k": _b64encode(self._xor(answer_key, nonce))
+        }, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+        self.issued += 1
+        return f"{_b64encode(body)}.{_b64encode(self._sign(body))}"
+
+    def verify(self, token, now=None):
+        """Devuelve los TokenClaims del token; lanza InvalidToken si no es válido"""
+        try:
+            claims = self._verify(token, time.time() if now is None else now)
+        except InvalidToken:
+            self.rejected += 1
+            raise
+        self.verified += 1
+        return claims
+
+    def _verify(self, token, now):
+        try:
+            body_text, signature_text = token.split(".")
+            body = _b64decode(body_text)
+            signature = _b64decode(signature_text)
+        except (AttributeError, ValueError):
+            raise InvalidToken("Token mal formado")
+        if not hmac.compare_digest(signature, self._sign(body)):
+            raise InvalidToken("Firma del token inválida")
+
+        payload = json.loads(body)
+        if payload.get("v") != TOKEN_VERSION:
+            raise InvalidToken("Versión de token no soportada")
+        if now > payload["exp"]:
+            raise InvalidToken("Token vencido")
+
+        answers = json.loads(self._xor(_b64decode(payload["k"]), _b64decode(payload["n"])))
+        return TokenClaims(
+            payload["quiz"], payload["iat"], payload["exp"],
+            {question_id: IssuedAnswer(question_id, answer) for question_id, answer in zip(payload["ids"], answers)}
+        )
+
+    def stats(self):
+        return {
+            "ttl_segundos": self.ttl,
+            "emitidos": self.issued,
+            "verificados": self.verified,
+            "rechazados": self.rejected
+        }
+
+
+# Sin secreto configurado los tokens quedan deshabilitados
+quiz_token_signer = QuizTokenSigner(QUIZ_TOKEN_SECRET) if QUIZ_TOKEN_SECRET else None
@@ -0,0 +1,203 @@
+"""Varios quizzes en un mismo proceso, cada uno con su propio banco en caché.
+
+Los quizzes se configuran en QUIZZES como JSON::
+
+    QUIZZES='{"historia": {"sheet_id": "1AbC...", "hoja": "Preguntas", "ttl": 600, "memoria_mb": 64},
+              "geografia": {"sheet_id": "1XyZ...", "hoja": 0}}'
+
+``hoja`` es el título o la posición de la hoja (por defecto la primera),
+``ttl`` los segundos de vigencia de su banco (QUESTIONS_CACHE_TTL si no se
+indica) y ``memoria_mb`` el tamaño máximo aproximado de su banco.
+
+Los bancos se cargan la primera vez que se pide el quiz. Cuando hay más de
+QUIZ_CACHE_SIZE cargados, o entre todos superan QUIZ_MEMORY_BUDGET_MB, se
+descartan los usados hace más tiempo; el quiz por defecto nunca se descarta.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict, namedtuple
+
+from metrics import timed_parse
+from question_bank import QUESTIONS_CACHE_TTL, QuestionBank
+from questions import IncrementalParser
+from sheets_client import SheetsClient
+from sources import GoogleSheetsSource
+
+logger = logging.getLogger(__name__)
+
+# Configuración de los quizzes (JSON, ver arriba)
+QUIZZES = os.environ.get('QUIZZES')
+
+# Identificador del banco principal de la app cuando la petición no indica quiz
+DEFAULT_QUIZ = "default"
+
+# Quizzes cargados a la vez y memoria total aproximada entre todos (0 = sin límite)
+QUIZ_CACHE_SIZE = int(os.environ.get('QUIZ_CACHE_SIZE', 8))
+QUIZ_MEMORY_BUDGET_MB = float(os.environ.get('QUIZ_MEMORY_BUDGET_MB', 0))
+
+QuizConfig = namedtuple("QuizConfig", "quiz_id sheet_id worksheet ttl memory_mb")
+
+
+class QuizMemoryExceeded(Exception):
+    """El banco de un quiz supera su presupuesto de memoria"""
+
+
+def parse_quiz_config(raw):
+    """Lee la configuración JSON de QUIZZES; lanza ValueError si está mal formada"""
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise ValueError(f"QUIZZES no es JSON válido: {str(e)}")
+    if not isinstance(data, dict):
+        raise ValueError("QUIZZES debe ser un objeto {quiz: configuración}")
+
+    configs = {}
+    for quiz_id, options in data.items():
+        if not isinstance(options, dict) or not options.get("sheet_id"):
+            raise ValueError(f"El quiz {quiz_id} necesita al menos sheet_id")
+        configs[quiz_id] = QuizConfig(
+            quiz_id, options["sheet_id"], options.get("hoja"),
+            float(options.get("ttl", QUESTIONS_CACHE_TTL)), float(options.get("memoria_mb", 0))
+        )
+    return configs
+
+
+def question_bytes(question):
+    """Memoria aproximada de una pregunta (los códigos y etiquetas internados no cuentan)"""
+    return (
+        sys.getsizeof(question) + sys.getsizeof(question.id) + sys.getsizeof(question.text)
+        + sys.getsizeof(question.options) + sum(sys.getsizeof(option) for option in question.options)
+    )
+
+
+class Quiz:
+    """Banco de un quiz con su propio cliente de Sheets, parser y vigencia.
+
+    ``memory_bytes`` se mantiene con los cambios de cada refresco, sin
+    recorrer el banco completo salvo en la primera carga.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.quiz_id = config.quiz_id
+        self.source = GoogleSheetsSource(SheetsClient(sheet_id=config.sheet_id, worksheet=config.worksheet))
+        self.parser = IncrementalParser()
+        self.bank = QuestionBank(self.load, ttl=config.ttl, get_revision=self.source.get_revision,
+                                 snapshot_path=None)
+        self.memory_bytes = 0
+        self._measured = None
+
+    def load(self):
+        logger.debug("Obteniendo datos del quiz %s...", self.quiz_id)
+        questions, changes = timed_parse(self.parser, self.source.iter_blocks())
+        if changes is None or changes.base is not self._measured:
+            memory = sum(map(question_bytes, questions))
+        else:
+            memory = (self.memory_bytes + sum(map(question_bytes, changes.upserted))
+                      - sum(map(question_bytes, changes.removed)))
+        budget = self.config.memory_mb * 2**20
+        if budget and memory > budget:
+            # Se sigue sirviendo la versión anterior (si la hay)
+            raise QuizMemoryExceeded(
+                f"El banco del quiz {self.quiz_id} ocupa ~{memory / 2**20:.1f} MB "
+                f"y su presupuesto es {self.config.memory_mb} MB"
+            )
+        self.memory_bytes = memory
+        self._measured = questions
+        logger.info("Quiz %s: %d preguntas válidas de %d filas", self.quiz_id, len(questions), self.parser.last_rows)
+        return questions, self.parser.last_rows, changes
+
+    def stats(self):
+        stats = self.bank.stats()
+        stats["memoria_mb"] = round(self.memory_bytes / 2**20, 2)
+        stats["presupuesto_mb"] = self.config.memory_mb or None
+        stats["origen"] = self.source.describe()
+        return stats
+
+
+class PinnedQuiz:
+    """El banco principal de la app (SHEET_ID o QUESTIONS_SOURCE) visto como un quiz más"""
+
+    def __init__(self, quiz_id, bank):
+        self.quiz_id = quiz_id
+        self.bank = bank
+
+    def stats(self):
+        return self.bank.stats()
+
+
+class QuizRegistry:
+    """Quizzes cargados, ordenados del menos al más recientemente usado"""
+
+    def __init__(self, configs, default=None, max_loaded=QUIZ_CACHE_SIZE, memory_budget_mb=QUIZ_MEMORY_BUDGET_MB):
+        self.configs = configs
+        self.default = default
+        self.max_loaded = max_loaded
+        self.memory_budget = memory_budget_mb * 2**20
+        self._lock = threading.Lock()
+        self._loaded = OrderedDict()
+        self.evictions = 0
+
+    def default_id(self):
+        if self.default is not None:
+            return self.default.quiz_id
+        return next(iter(self.configs), None)
+
+    def available(self):
+        quiz_ids = sorted(self.configs)
+        if self.default is not None:
+            quiz_ids.insert(0, self.default.quiz_id)
+        return quiz_ids
+
+    def get(self, quiz_id=None):
+        """Quiz pedido (o el por defecto); None si no existe. No descarga nada"""
+        quiz_id = quiz_id or self.default_id()
+        if self.default is not None and quiz_id == self.default.quiz_id:
+            return self.default
+        config = self.configs.get(quiz_id)
+        if config is None:
+            return None
+
+        with self._lock:
+            quiz = self._loaded.get(quiz_id)
+            if quiz is None:
+                quiz = self._loaded[quiz_id] = Quiz(config)
+            self._loaded.move_to_end(quiz_id)
+            self._evict(keep=quiz_id)
+        return quiz
+
+    def _evict(self, keep):
+        total = sum(quiz.memory_bytes for quiz in self._loaded.values())
+        for quiz_id in list(self._loaded):
+            over_count = len(self._loaded) > self.max_loaded
+            over_memory = self.memory_budget and total > self.memory_budget
+            if not (over_count or over_memory):
+                break
+            if quiz_id == keep:
+                continue
+            evicted = self._loaded.pop(quiz_id)
+            total -= evicted.memory_bytes
+            self.evictions += 1
+            logger.info("Quiz %s descartado de la caché (%.1f MB)", quiz_id, evicted.memory_bytes / 2**20)
+
+    def loaded(self):
+        """Quizzes con banco propio cargados en este momento"""
+        with self._lock:
+            return list(self._loaded.values())
+
+    def stats(self):
+        loaded = self.loaded()
+        quizzes = {quiz.quiz_id: quiz.stats() for quiz in loaded}
+        return {
+            "configurados": sorted(self.configs),
+            "por_defecto": self.default_id(),
+            "cargados": [quiz.quiz_id for quiz in loaded],
+            "maximo_cargados": self.max_loaded,
+            "memoria_mb": round(sum(quiz.memory_bytes for quiz in loaded) / 2**20, 2),
+            "presupuesto_mb": self.memory_budget / 2**20 or None,
+            "descartes": self.evictions,
+            "quizzes": quizzes
+        }
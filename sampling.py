@@ -0,0 +1,102 @@
+import os
+import random
+import threading
+from array import array
+
+# Campos de la API por los que se puede filtrar o estratificar -> atributo de Question
+STRATA_FIELDS = {
+    "categoria": "category",
+    "dificultad": "difficulty"
+}
+
+_local = threading.local()
+
+
+def request_rng():
+    """Generador aleatorio del hilo actual (sin estado compartido entre peticiones concurrentes)"""
+    rng = getattr(_local, "rng", None)
+    if rng is None:
+        rng = _local.rng = random.Random(os.urandom(16))
+    return rng
+
+
+def build_strata(questions, field):
+    """Agrupa las posiciones del banco por el valor de ``field`` en arreglos compactos"""
+    # Los bancos respaldados por una base agrupan con sus propios índices
+    if hasattr(questions, "strata"):
+        return questions.strata(field)
+    strata = {}
+    for i, question in enumerate(questions):
+        key = getattr(question, field)
+        positions = strata.get(key)
+        if positions is None:
+            positions = strata[key] = array("I")
+        positions.append(i)
+    return strata
+
+
+def allocate(sizes, k, weights):
+    """Reparte ``k`` extracciones entre estratos según ``weights``, sin superar su tamaño.
+
+    Usa el método del mayor resto; lo que un estrato no puede cubrir se
+    reparte entre los demás. Los estratos con peso 0 no reciben nada.
+    """
+    allocation = {key: 0 for key in sizes}
+    active = [key for key in sizes if sizes[key] > 0 and weights.get(key, 0) > 0]
+    remaining = min(k, sum(sizes[key] for key in active))
+
+    while remaining and active:
+        total_weight = sum(weights[key] for key in active)
+        quotas = {key: remaining * weights[key] / total_weight for key in active}
+        given = 0
+        for key in active:
+            take = min(int(quotas[key]), sizes[key] - allocation[key])
+            allocation[key] += take
+            given += take
+        if given == 0:
+            # Solo quedan fracciones: una extracción a cada estrato con mayor resto
+            by_remainder = sorted(active, key=lambda key: quotas[key] - int(quotas[key]), reverse=True)
+            for key in by_remainder[:remaining]:
+                allocation[key] += 1
+                given += 1
+        remaining -= given
+        active = [key for key in active if allocation[key] < sizes[key]]
+
+    return allocation
+
+
+def draw(snapshot, cantidad, rng, filters=None, stratify_by=None, weights=None):
+    """Elige posiciones del banco sin copiarlo.
+
+    - Sin filtros ni estratos: muestreo uniforme sobre ``range(n)``.
+    - ``filters``: {atributo: valor}; se muestrea dentro del estrato (o la
+      intersección de estratos) correspondiente.
+    - ``stratify_by``: atributo por el que repartir la muestra entre
+      estratos, proporcional a su tamaño o a ``weights`` si se indica.
+    """
+    if filters:
+        pools = [snapshot.strata(field).get(value, ()) for field, value in filters.items()]
+        pools.sort(key=len)
+        pool = pools[0]
+        if len(pools) > 1:
+            others = [set(p) for p in pools[1:]]
+            pool = array("I", (i for i in pool if all(i in other for other in others)))
+    else:
+        pool = range(len(snapshot.questions))
+
+    if not stratify_by:
+        return rng.sample(pool, min(cantidad, len(pool)))
+
+    strata = snapshot.strata(stratify_by)
+    if filters:
+        allowed = set(pool)
+        strata = {key: array("I", (i for i in positions if i in allowed)) for key, positions in strata.items()}
+    sizes = {key: len(positions) for key, positions in strata.items()}
+    allocation = allocate(sizes, cantidad, weights if weights is not None else sizes)
+
+    indices = []
+    for key, count in allocation.items():
+        if count:
+            indices.extend(rng.sample(strata[key], count))
+    rng.shuffle(indices)
+    return indices
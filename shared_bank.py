@@ -0,0 +1,318 @@
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+from contextlib import contextmanager
+
+from question_bank import QUESTIONS_CACHE_TTL, BankSnapshot, QuestionBank
+from questions import Question
+
+logger = logging.getLogger(__name__)
+
+# Archivo del banco compartido entre los workers del host (idealmente en /dev/shm)
+QUESTIONS_SHARED_PATH = os.environ.get('QUESTIONS_SHARED_PATH')
+
+# Cada cuánto un worker revisa si otro publicó una versión nueva del archivo
+SHARED_CHECK_INTERVAL = 1.0
+
+# Formato binario (little-endian):
+#   cabecera | revisión (utf-8) | offsets (count + 1, u64) | orden por ID (id_count, u32) | registros
+# Cada registro: u8 con el número de opciones y luego id, texto, códigos,
+# respuesta, categoría, dificultad y opciones, cada campo como u32 de
+# longitud + bytes utf-8.
+MAGIC = b"QBNK"
+FORMAT_VERSION = 2
+_FIXED_FIELDS = 6
+_HEADER = struct.Struct("<4sHHIIQQI")
+_U8 = struct.Struct("<B")
+_U32 = struct.Struct("<I")
+
+
+def _encode_question(q):
+    fields = [q.id, q.text, q.codes, q.answer, q.category, q.difficulty, *q.options]
+    parts = [_U8.pack(len(q.options))]
+    for field in fields:
+        data = field.encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def write_shared_bank(path, questions, total_rows, revision, generation):
+    """Serializa el banco al formato binario y lo publica de forma atómica"""
+    records = [_encode_question(q) for q in questions]
+
+    offsets = array("Q", [0])
+    for record in records:
+        offsets.append(offsets[-1] + len(record))
+
+    # Un ID repetido apunta a su última fila, igual que build_index()
+    last_by_id = {}
+    for i, q in enumerate(questions):
+        last_by_id[q.id.encode("utf-8")] = i
+    id_order = array("I", (last_by_id[key] for key in sorted(last_by_id)))
+
+    revision_bytes = (revision or "").encode("utf-8")
+    header = _HEADER.pack(
+        MAGIC, FORMAT_VERSION, 0, len(records), len(id_order),
+        generation, total_rows, len(revision_bytes)
+    )
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(revision_bytes)
+        f.write(offsets.tobytes())
+        f.write(id_order.tobytes())
+        for record in records:
+            f.write(record)
+    os.replace(tmp_path, path)
+
+
+class SharedBankView:
+    """Vista de solo lectura sobre el archivo mapeado en memoria.
+
+    Las páginas del archivo las comparte el sistema operativo entre todos
+    los procesos; cada pregunta se decodifica solo cuando se accede a ella.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.file_key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self.published_at = stat.st_mtime
+
+        (magic, fmt, _reserved, self.count, self.id_count,
+         self.generation, self.total_rows, revision_len) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION:
+            raise ValueError(f"{path} no es un banco compartido compatible")
+
+        pos = _HEADER.size
+        self.revision = self._mm[pos:pos + revision_len].decode("utf-8") or None
+        pos += revision_len
+        self._offsets_pos = pos
+        pos += 8 * (self.count + 1)
+        self._ids_pos = pos
+        self._data_pos = pos + 4 * self.id_count
+
+    def _record_pos(self, i):
+        (offset,) = struct.unpack_from("<Q", self._mm, self._offsets_pos + 8 * i)
+        return self._data_pos + offset
+
+    def _read_field(self, pos):
+        (length,) = _U32.unpack_from(self._mm, pos)
+        pos += 4
+        return self._mm[pos:pos + length], pos + length
+
+    def question_at(self, i):
+        pos = self._record_pos(i)
+        (n_options,) = _U8.unpack_from(self._mm, pos)
+        pos += 1
+        fields = []
+        for _ in range(_FIXED_FIELDS + n_options):
+            data, pos = self._read_field(pos)
+            fields.append(data.decode("utf-8"))
+        question_id, text, codes, answer, category, difficulty = fields[:_FIXED_FIELDS]
+        return Question(
+            question_id, text, sys.intern(codes), tuple(fields[_FIXED_FIELDS:]), sys.intern(answer),
+            sys.intern(category), sys.intern(difficulty)
+        )
+
+    def id_at(self, slot):
+        """ID de la posición ``slot`` del orden por ID, como bytes"""
+        (i,) = _U32.unpack_from(self._mm, self._ids_pos + 4 * slot)
+        data, _ = self._read_field(self._record_pos(i) + 1)
+        return data, i
+
+    def find(self, question_id):
+        """Búsqueda binaria del ID; devuelve la posición del registro o None"""
+        target = question_id.encode("utf-8")
+        lo, hi = 0, self.id_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            key, i = self.id_at(mid)
+            if key < target:
+                lo = mid + 1
+            elif key > target:
+                hi = mid
+            else:
+                return i
+        return None
+
+    def age(self):
+        return time.time() - self.published_at
+
+
+class MappedQuestions(Sequence):
+    """Secuencia de preguntas respaldada por el archivo compartido"""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __len__(self):
+        return self._view.count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("índice de pregunta fuera de rango")
+        return self._view.question_at(i)
+
+
+class MappedIndex(Mapping):
+    """Índice ID -> pregunta con búsqueda binaria sobre el archivo compartido"""
+
+    def __init__(self, view):
+        self._view = view
+
+    def __len__(self):
+        return self._view.id_count
+
+    def __iter__(self):
+        for slot in range(self._view.id_count):
+            yield self._view.id_at(slot)[0].decode("utf-8")
+
+    def __getitem__(self, question_id):
+        if not isinstance(question_id, str):
+            raise KeyError(question_id)
+        i = self._view.find(question_id)
+        if i is None:
+            raise KeyError(question_id)
+        return self._view.question_at(i)
+
+
+class SharedQuestionBank(QuestionBank):
+    """Banco de preguntas compartido por todos los workers de un host.
+
+    Un solo worker a la vez (elegido con un flock sobre ``<archivo>.lock``)
+    consulta Google Sheets y publica el banco en un archivo binario; el
+    resto lo mapea en memoria con mmap. Así la memoria es O(banco) por host
+    en lugar de O(banco × workers) y Sheets se consulta una vez por host.
+    La vigencia se mide con la fecha de modificación del archivo, común a
+    todos los procesos.
+    """
+
+    def __init__(self, loader, path, ttl=QUESTIONS_CACHE_TTL, get_revision=None):
+        super().__init__(loader, ttl=ttl, get_revision=get_revision, snapshot_path=None)
+        self.path = path
+        self._lock_fd = None
+        self._view = None
+        self._last_check = 0.0
+
+        # Contadores para monitoreo
+        self.remaps = 0
+
+    @contextmanager
+    def _leader(self, blocking):
+        """Intenta ser el worker que refresca; produce True si lo consiguió"""
+        # Dentro del proceso los refrescos ya llegan de a uno (SingleFlight)
+        if self._lock_fd is None:
+            self._lock_fd = os.open(f"{self.path}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+        flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+        try:
+            fcntl.flock(self._lock_fd, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _open_latest(self):
+        """Mapea el archivo publicado si cambió desde el último mapeo"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return self._view
+        if self._view is not None and \
+                self._view.file_key == (stat.st_ino, stat.st_mtime_ns, stat.st_size):
+            return self._view
+        self._view = SharedBankView(self.path)
+        return self._view
+
+    def _publish_view(self, view):
+        # La edad se traduce al reloj monotónico del proceso
+        loaded_at = time.monotonic() - view.age()
+        with self._state_lock:
+            self._snapshot = BankSnapshot(
+                view.generation, MappedQuestions(view), view.total_rows, loaded_at,
+                view.revision, index=MappedIndex(view)
+            )
+            self.remaps += 1
+        return self._snapshot
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check >= SHARED_CHECK_INTERVAL:
+            # Otro worker pudo haber publicado una versión nueva
+            self._last_check = now
+            view = self._open_latest()
+            if view is not None and view.file_key != self._published_key(snapshot):
+                self._publish_view(view)
+        return super().get()
+
+    def _published_key(self, snapshot):
+        questions = snapshot.questions
+        return questions._view.file_key if isinstance(questions, MappedQuestions) else None
+
+    def load_snapshot(self):
+        """Mapea el archivo compartido existente, si lo hay, sin consultar Sheets"""
+        if self._snapshot is not None:
+            return False
+        try:
+            view = self._open_latest()
+        except (OSError, ValueError) as e:
+            logger.warning("Banco compartido %s ilegible, se ignora: %s", self.path, e)
+            return False
+        if view is None:
+            return False
+        self._publish_view(view)
+        self.loaded_from_snapshot = True
+        logger.info("Banco compartido mapeado desde %s: %d preguntas", self.path, view.count)
+        return True
+
+    def _do_refresh(self):
+        self._last_attempt = time.monotonic()
+        # En el arranque en frío se espera al worker que esté refrescando
+        blocking = self._snapshot is None
+        with self._leader(blocking) as leader:
+            view = self._open_latest()
+            if not leader or (view is not None and view.age() < self.ttl):
+                # Otro worker refresca (o acaba de hacerlo): usar lo publicado
+                return self._publish_view(view) if view is not None else self._snapshot
+
+            revision = self._current_revision()
+            if view is not None and revision is not None and revision == view.revision:
+                # Sin cambios en el documento: renovar la vigencia para todos los workers
+                os.utime(self.path)
+                self.skipped_refreshes += 1
+                return self._publish_view(self._open_latest())
+
+            try:
+                questions, total_rows = self._loader()[:2]
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = f"{type(e).__name__}: {str(e)}"
+                raise
+
+            generation = view.generation + 1 if view is not None else 1
+            write_shared_bank(self.path, questions, total_rows, revision, generation)
+            self.refreshes += 1
+            return self._publish_view(self._open_latest())
+
+    def stats(self):
+        stats = super().stats()
+        stats["archivo_compartido"] = self.path
+        stats["remapeos"] = self.remaps
+        return stats
@@ -0,0 +1,357 @@
+import contextvars
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import gspread
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.service_account import Credentials
+from gspread.urls import DRIVE_FILES_API_V3_URL
+
+from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Configuración de Google Sheets
+SCOPES = [
+    'https://www.googleapis.com/auth/spreadsheets.readonly',
+    'https://www.googleapis.com/auth/drive.readonly'
+]
+
+# Segundos antes de la expiración en los que se renueva el token por adelantado
+TOKEN_REFRESH_MARGIN = int(os.environ.get('TOKEN_REFRESH_MARGIN', 300))
+
+# Lecturas a Google Sheets por minuto que se permite este proceso (0 = sin límite).
+# La cuota de Google es por proyecto y usuario: con varios workers, repartirla entre ellos
+SHEETS_READS_PER_MINUTE = float(os.environ.get('SHEETS_READS_PER_MINUTE', 60))
+
+# Reintentos ante un 429 de Google: espera exponencial con jitter, acotada por
+# SHEETS_BACKOFF_MAX por intento y SHEETS_RETRY_DEADLINE en total (por debajo
+# del timeout de 30 s de gunicorn). Solo fuera de las peticiones: ver allow_retries()
+SHEETS_MAX_RETRIES = int(os.environ.get('SHEETS_MAX_RETRIES', 4))
+SHEETS_BACKOFF_BASE = float(os.environ.get('SHEETS_BACKOFF_BASE', 1))
+SHEETS_BACKOFF_MAX = float(os.environ.get('SHEETS_BACKOFF_MAX', 16))
+SHEETS_RETRY_DEADLINE = float(os.environ.get('SHEETS_RETRY_DEADLINE', 20))
+
+# False mientras se atiende una petición: ante un 429 se falla enseguida y los
+# reintentos con espera quedan para los refrescos de fondo
+_retries_allowed = contextvars.ContextVar("sheets_retries_allowed", default=True)
+
+
+def allow_retries(allowed=True):
+    """Habilita o no los reintentos con espera ante un 429 en el contexto actual"""
+    # Los hilos de Flask reutilizan el contexto de la petición anterior: se fija en cada una
+    _retries_allowed.set(allowed)
+
+
+def _utcnow():
+    # google-auth guarda la expiración como datetime UTC sin zona horaria
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def is_auth_error(error):
+    """Indica si un error se debe a credenciales inválidas o expiradas"""
+    if isinstance(error, RefreshError):
+        return True
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error.response, "status_code", None) == 401
+    return False
+
+
+def is_rate_limit_error(error):
+    """Indica si Google rechazó la llamada por exceder la cuota de lecturas"""
+    if not isinstance(error, gspread.exceptions.APIError):
+        return False
+    if getattr(error.response, "status_code", None) == 429:
+        return True
+    detail = error.args[0] if error.args else None
+    return isinstance(detail, dict) and detail.get("status") == "RESOURCE_EXHAUSTED"
+
+
+def retry_after_seconds(error):
+    """Segundos que pide esperar la cabecera Retry-After de la respuesta, si viene"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt, base=SHEETS_BACKOFF_BASE, cap=SHEETS_BACKOFF_MAX):
+    """Espera antes del reintento ``attempt`` (desde 0): la mitad fija y la otra mitad al azar"""
+    ceiling = min(cap, base * 2 ** attempt)
+    return ceiling / 2 + random.uniform(0, ceiling / 2)
+
+
+class SheetsThrottled(Exception):
+    """Google Sheets está limitando las lecturas o se agotó el cupo propio del proceso"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaBudget:
+    """Cupo de lecturas por minuto (token bucket) compartido por todos los clientes del proceso.
+
+    Al agotarse, las lecturas fallan al instante con SheetsThrottled en lugar
+    de salir a recibir un 429: el banco sigue sirviendo su última versión.
+    """
+
+    def __init__(self, per_minute=SHEETS_READS_PER_MINUTE):
+        self.per_minute = per_minute
+        self._rate = per_minute / 60
+        self._tokens = per_minute
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        # Contadores para monitoreo
+        self.consumed = 0
+        self.rejected = 0
+
+    def _refill(self, now):
+        self._tokens = min(self.per_minute, self._tokens + (now - self._updated) * self._rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Consume una lectura; False si no queda cupo"""
+        if not self.per_minute:
+            return True
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < 1:
+                self.rejected += 1
+                return False
+            self._tokens -= 1
+            self.consumed += 1
+            return True
+
+    def wait_time(self):
+        """Segundos hasta que vuelva a haber cupo para una lectura"""
+        if not self.per_minute:
+            return 0.0
+        with self._lock:
+            self._refill(time.monotonic())
+            return max(0.0, (1 - self._tokens) / self._rate)
+
+    def available(self):
+        if not self.per_minute:
+            return None
+        with self._lock:
+            self._refill(time.monotonic())
+            return int(self._tokens)
+
+    def stats(self):
+        return {
+            "lecturas_por_minuto": self.per_minute or None,
+            "disponibles": self.available(),
+            "consumidas": self.consumed,
+            "rechazadas": self.rejected
+        }
+
+
+# Cupo único por proceso: la cuota de Google no distingue documentos ni hojas
+sheets_quota = QuotaBudget()
+
+
+def fetch_revision(sheet):
+    """Consulta en Drive la revisión actual del documento que contiene la hoja"""
+    url = f"{DRIVE_FILES_API_V3_URL}/{sheet.spreadsheet_id}"
+    params = {"fields": "version,modifiedTime", "supportsAllDrives": True}
+    metadata = sheet.client.request("get", url, params=params).json()
+    return f"{metadata.get('version')}:{metadata.get('modifiedTime')}"
+
+
+def fetch_row_count(sheet):
+    """Filas de la grilla según los metadatos actuales (la hoja abierta guarda las de cuando se abrió)"""
+    metadata = sheet.client.fetch_sheet_metadata(
+        sheet.spreadsheet_id, params={"fields": "sheets.properties(sheetId,gridProperties.rowCount)"}
+    )
+    for item in metadata.get("sheets", []):
+        properties = item["properties"]
+        if properties["sheetId"] == sheet.id:
+            return properties["gridProperties"]["rowCount"]
+    return sheet.row_count
+
+
+class SheetsClient:
+    """Cliente de Google Sheets compartido por todo el proceso.
+
+    Autoriza una sola vez por worker y reutiliza el cliente y la hoja en
+    cada petición. El token se renueva antes de expirar y el cliente solo
+    se reconstruye cuando Google rechaza las credenciales.
+
+    Por defecto abre la primera hoja del documento SHEET_ID; ``sheet_id`` y
+    ``worksheet`` (título o posición) permiten apuntar a otro documento u
+    otra hoja.
+    """
+
+    def __init__(self, scopes=SCOPES, refresh_margin=TOKEN_REFRESH_MARGIN, sheet_id=None, worksheet=None,
+                 quota=sheets_quota, max_retries=SHEETS_MAX_RETRIES, retry_deadline=SHEETS_RETRY_DEADLINE):
+        self.sheet_id = sheet_id
+        self.worksheet = worksheet
+        self.scopes = scopes
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        # Protege el cliente y la hoja; se toma durante la autorización (red)
+        self._lock = threading.Lock()
+        # Solo para los contadores: stats() nunca espera a la red
+        self._counters_lock = threading.Lock()
+        self._creds = None
+        self._client = None
+        self._sheet = None
+        self.quota = quota
+        self.max_retries = max_retries
+        self.retry_deadline = retry_deadline
+
+        # Contadores para monitoreo
+        self.hits = 0
+        self.rebuilds = 0
+        self.token_refreshes = 0
+        self.auth_failures = 0
+        self.throttled = 0
+        self.retries = 0
+        self.gave_up = 0
+
+    def _build(self):
+        """Carga las credenciales, autoriza y abre la hoja"""
+        # Las credenciales deben estar en una variable de entorno como JSON string
+        creds_json = os.environ.get('GOOGLE_CREDENTIALS')
+        if not creds_json:
+            raise ValueError("GOOGLE_CREDENTIALS no configurado")
+
+        # ID del documento de Google Sheets (desde variable de entorno)
+        sheet_id = self.sheet_id or os.environ.get('SHEET_ID')
+        if not sheet_id:
+            raise ValueError("SHEET_ID no configurado")
+
+        with stage("credenciales"):
+            creds_dict = json.loads(creds_json)
+            creds = Credentials.from_service_account_info(creds_dict, scopes=self.scopes)
+            client = gspread.authorize(creds)
+        with stage("abrir_hoja"):
+            spreadsheet = client.open_by_key(sheet_id)
+            if self.worksheet is None:
+                sheet = spreadsheet.sheet1
+            elif isinstance(self.worksheet, int):
+                sheet = spreadsheet.get_worksheet(self.worksheet)
+            else:
+                sheet = spreadsheet.worksheet(self.worksheet)
+
+        self._creds = creds
+        self._client = client
+        self._sheet = sheet
+        self._count("rebuilds")
+
+    def _count(self, counter):
+        with self._counters_lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _token_expiring(self):
+        expiry = self._creds.expiry
+        if not self._creds.token or expiry is None:
+            return True
+        return expiry - _utcnow() <= self.refresh_margin
+
+    def get_worksheet(self):
+        """Devuelve la hoja, autorizando solo la primera vez"""
+        with self._lock:
+            if self._sheet is None:
+                self._build()
+                return self._sheet
+
+            self._count("hits")
+            if self._token_expiring():
+                try:
+                    with stage("credenciales"):
+                        self._creds.refresh(Request())
+                    self._count("token_refreshes")
+                except RefreshError:
+                    self._count("auth_failures")
+                    self._build()
+            return self._sheet
+
+    def invalidate(self):
+        """Descarta el cliente actual; el siguiente acceso lo reconstruye"""
+        with self._lock:
+            self._creds = None
+            self._client = None
+            self._sheet = None
+
+    def call(self, fn, quota=True):
+        """Ejecuta fn(hoja) dentro del cupo de lecturas, reintentando con backoff ante un 429.
+
+        Con ``quota`` False la llamada no consume cupo de Sheets (la consulta
+        de revisión va a Drive, que tiene su propia cuota). Lanza
+        SheetsThrottled si no hay cupo o si Google sigue limitando tras los
+        reintentos; dentro de una petición (``allow_retries(False)``), al
+        primer 429.
+        """
+        deadline = time.monotonic() + self.retry_deadline
+        max_retries = self.max_retries if _retries_allowed.get() else 0
+        attempt = 0
+        while True:
+            if quota and not self.quota.try_acquire():
+                raise SheetsThrottled("Cupo de lecturas a Google Sheets agotado", self.quota.wait_time())
+            try:
+                return self._call_authorized(fn)
+            except Exception as e:
+                if not is_rate_limit_error(e):
+                    raise
+                delay = max(backoff_delay(attempt), retry_after_seconds(e) or 0)
+                give_up = attempt >= max_retries or time.monotonic() + delay > deadline
+                self._count("throttled")
+                self._count("gave_up" if give_up else "retries")
+                if give_up:
+                    raise SheetsThrottled(f"Google Sheets limitó las lecturas: {str(e)}", delay) from e
+                logger.warning("Google Sheets respondió 429, reintento %d en %.1f s", attempt + 1, delay)
+                time.sleep(delay)
+                attempt += 1
+
+    def _call_authorized(self, fn):
+        """Ejecuta fn(hoja), reconstruyendo el cliente una vez si falla la autenticación"""
+        sheet = self.get_worksheet()
+        try:
+            return fn(sheet)
+        except Exception as e:
+            if not is_auth_error(e):
+                raise
+            logger.warning("Credenciales rechazadas, reconstruyendo cliente: %s", e)
+            self._count("auth_failures")
+            self.invalidate()
+            return fn(self.get_worksheet())
+
+    def get_row_count(self):
+        """Filas actuales de la grilla (una lectura de metadatos)"""
+        return self.call(fetch_row_count)
+
+    def get_revision(self):
+        """Revisión del documento según Drive; cambia con cada edición"""
+        return self.call(fetch_revision, quota=False)
+
+    def stats(self):
+        """Contadores del cliente para monitoreo"""
+        # Sin self._lock: lo retiene get_worksheet() mientras autoriza o renueva el token,
+        # y /metrics y /api/stats corren en el loop de la variante ASGI
+        creds = self._creds
+        expiry = creds.expiry if creds else None
+        with self._counters_lock:
+            return {
+                "autorizado": self._sheet is not None,
+                "token_expira": expiry.isoformat() + "Z" if expiry else None,
+                "hits": self.hits,
+                "reconstrucciones": self.rebuilds,
+                "renovaciones_token": self.token_refreshes,
+                "fallos_autenticacion": self.auth_failures,
+                "limitadas_429": self.throttled,
+                "reintentos": self.retries,
+                "abandonadas": self.gave_up
+            }
+
+
+# Instancia única por proceso (cada worker de gunicorn tiene la suya)
+sheets_client = SheetsClient()
@@ -0,0 +1,64 @@
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+
+from questions import Question
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "banco-preguntas"
+SNAPSHOT_FORMAT_VERSION = 2
+
+
+def write_snapshot(path, snapshot):
+    """Guarda el banco en formato JSON Lines: una cabecera y una pregunta por línea.
+
+    Se escribe en un archivo temporal y se reemplaza de forma atómica, así
+    un worker que lee nunca ve un archivo a medio escribir.
+    """
+    header = {
+        "formato": SNAPSHOT_FORMAT,
+        "version_formato": SNAPSHOT_FORMAT_VERSION,
+        "revision": snapshot.revision,
+        "filas_totales": snapshot.total_rows,
+        "preguntas": len(snapshot.questions),
+        "guardado": datetime.now(timezone.utc).isoformat()
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(header, ensure_ascii=False) + "\n")
+        for q in snapshot.questions:
+            record = [q.id, q.text, q.codes, q.options, q.answer, q.category, q.difficulty]
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path):
+    """Lee un snapshot; devuelve (cabecera, preguntas) o None si no es utilizable"""
+    try:
+        with open(path, encoding="utf-8") as f:
+            header = json.loads(f.readline())
+            if header.get("formato") != SNAPSHOT_FORMAT or \
+                    header.get("version_formato") != SNAPSHOT_FORMAT_VERSION:
+                logger.warning("Snapshot %s con formato desconocido, se ignora", path)
+                return None
+
+            questions = []
+            for line in f:
+                question_id, text, codes, options, answer, category, difficulty = json.loads(line)
+                questions.append(Question(
+                    question_id, text, sys.intern(codes), tuple(options), sys.intern(answer),
+                    sys.intern(category), sys.intern(difficulty)
+                ))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError) as e:
+        logger.warning("Snapshot %s ilegible, se ignora: %s", path, e)
+        return None
+
+    if len(questions) != header.get("preguntas"):
+        logger.warning("Snapshot %s incompleto, se ignora", path)
+        return None
+    return header, questions
@@ -0,0 +1,201 @@
+import csv
+import json
+import os
+import sqlite3
+
+from sheets_client import sheets_client
+
+# Origen del banco: sheets (por defecto), csv, jsonl o sqlite
+QUESTIONS_SOURCE = os.environ.get('QUESTIONS_SOURCE', 'sheets')
+QUESTIONS_SOURCE_PATH = os.environ.get('QUESTIONS_SOURCE_PATH')
+
+# Lectura del sheet por rangos: filas por bloque (0 = todo de una vez con get_all_values)
+# y bloques pedidos en cada llamada a batch_get
+SHEETS_BLOCK_ROWS = int(os.environ.get('SHEETS_BLOCK_ROWS', 0))
+SHEETS_BLOCKS_PER_REQUEST = int(os.environ.get('SHEETS_BLOCKS_PER_REQUEST', 4))
+
+# Encabezado con el mismo orden de columnas que el sheet (A-I)
+COLUMNS = ["id", "pregunta", "A", "B", "C", "D", "respuesta_correcta", "categoria", "dificultad"]
+
+# Columnas mínimas de una fila (A-G); la API omite las celdas vacías del final
+_MIN_COLUMNS = 7
+
+
+def _cell(value):
+    """Celda como texto, igual que las devuelve Google Sheets (vacía si no hay valor)"""
+    return "" if value is None else str(value)
+
+
+def _file_revision(*paths):
+    """Revisión de archivos locales: cambia cuando cambia su fecha o tamaño"""
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        parts.append(f"{stat.st_mtime_ns}:{stat.st_size}")
+    return "|".join(parts) or None
+
+
+class QuestionSource:
+    """Origen de las filas del banco de preguntas.
+
+    ``fetch_rows()`` devuelve las filas con la disposición del sheet
+    (encabezado en la primera fila, columnas A-I) y ``get_revision()`` un
+    identificador que cambia cuando cambia el contenido, o None si el
+    origen no lo sabe.
+
+    ``iter_blocks()`` entrega las mismas filas como pares ``(número de la
+    primera fila, filas)``; por defecto en un único bloque.
+    """
+
+    kind = None
+
+    def fetch_rows(self):
+        raise NotImplementedError
+
+    def iter_blocks(self):
+        yield 1, self.fetch_rows()
+
+    def get_revision(self):
+        return None
+
+    def describe(self):
+        return {"tipo": self.kind}
+
+
+class GoogleSheetsSource(QuestionSource):
+    """Primera hoja del documento SHEET_ID, vía el cliente compartido del proceso.
+
+    Con ``block_rows`` las filas se leen por rangos A-I de ese tamaño, varios
+    por llamada a batch_get, en lugar de descargar la hoja entera en una
+    sola respuesta.
+    """
+
+    kind = "sheets"
+
+    def __init__(self, client=sheets_client, block_rows=SHEETS_BLOCK_ROWS,
+                 blocks_per_request=SHEETS_BLOCKS_PER_REQUEST):
+        self.client = client
+        self.block_rows = block_rows
+        self.blocks_per_request = max(1, blocks_per_request)
+
+    def fetch_rows(self):
+        return self.client.call(lambda sheet: sheet.get_all_values())
+
+    def iter_blocks(self):
+        if not self.block_rows:
+            yield from super().iter_blocks()
+            return
+
+        # Tamaño actual de la grilla (la hoja pudo crecer desde que se abrió):
+        # la API rechaza rangos fuera de ella, así que nunca se pide más allá
+        row_count = self.client.get_row_count()
+        step = self.block_rows * self.blocks_per_request
+        for start in range(1, row_count + 1, step):
+            starts = range(start, min(start + step, row_count + 1), self.block_rows)
+            ranges = [f"A{first}:I{min(first + self.block_rows - 1, row_count)}" for first in starts]
+            value_ranges = self.client.call(lambda sheet: sheet.batch_get(ranges))
+            for first, values in zip(starts, value_ranges):
+                if values:
+                    # Mismo ancho mínimo que get_all_values, que rellena las celdas vacías
+                    yield first, [row if len(row) >= _MIN_COLUMNS else row + [""] * (_MIN_COLUMNS - len(row))
+                                  for row in values]
+
+    def get_revision(self):
+        return self.client.get_revision()
+
+    def describe(self):
+        info = {"tipo": self.kind, "sheet_id": self.client.sheet_id or os.environ.get('SHEET_ID')}
+        if self.client.worksheet is not None:
+            info["hoja"] = self.client.worksheet
+        if self.block_rows:
+            info["filas_por_bloque"] = self.block_rows
+            info["bloques_por_peticion"] = self.blocks_per_request
+        return info
+
+
+class FileSource(QuestionSource):
+    def __init__(self, path):
+        self.path = path
+
+    def get_revision(self):
+        return _file_revision(self.path)
+
+    def describe(self):
+        return {"tipo": self.kind, "ruta": self.path}
+
+
+class CsvSource(FileSource):
+    """Archivo CSV exportado del sheet (con fila de encabezado)"""
+
+    kind = "csv"
+
+    def fetch_rows(self):
+        with open(self.path, newline="", encoding="utf-8-sig") as f:
+            return list(csv.reader(f))
+
+
+class JsonLinesSource(FileSource):
+    """Archivo JSON Lines: cada línea es una lista con las columnas A-I o un
+    objeto con las claves de ``COLUMNS``"""
+
+    kind = "jsonl"
+
+    def fetch_rows(self):
+        rows = [COLUMNS]
+        with open(self.path, encoding="utf-8") as f:
+            for numero, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict):
+                    record = [record.get(col) for col in COLUMNS]
+                elif not isinstance(record, list):
+                    raise ValueError(f"{self.path}:{numero}: se esperaba una lista o un objeto")
+                rows.append([_cell(value) for value in record])
+        return rows
+
+
+class SqliteSource(FileSource):
+    """Tabla ``preguntas`` de una base SQLite con las columnas de ``COLUMNS``"""
+
+    kind = "sqlite"
+
+    QUERY = """
+        SELECT id, pregunta, opcion_a, opcion_b, opcion_c, opcion_d,
+               respuesta_correcta, categoria, dificultad
+        FROM preguntas ORDER BY rowid
+    """
+
+    def fetch_rows(self):
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+        try:
+            rows = [COLUMNS]
+            rows.extend([_cell(value) for value in row] for row in conn.execute(self.QUERY))
+            return rows
+        finally:
+            conn.close()
+
+    def get_revision(self):
+        # En modo WAL los cambios recientes están en el archivo -wal
+        return _file_revision(self.path, f"{self.path}-wal")
+
+
+SOURCES = {
+    "csv": CsvSource,
+    "jsonl": JsonLinesSource,
+    "sqlite": SqliteSource,
+}
+
+
+def source_from_env(kind=QUESTIONS_SOURCE, path=QUESTIONS_SOURCE_PATH):
+    """Crea el origen configurado con QUESTIONS_SOURCE / QUESTIONS_SOURCE_PATH"""
+    if kind == "sheets":
+        return GoogleSheetsSource()
+    if kind not in SOURCES:
+        raise ValueError(f"QUESTIONS_SOURCE desconocido: {kind} (opciones: sheets, {', '.join(SOURCES)})")
+    if not path:
+        raise ValueError(f"QUESTIONS_SOURCE_PATH no configurado para el origen {kind}")
+    return SOURCES[kind](path)
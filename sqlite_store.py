@@ -0,0 +1,392 @@
+"""Banco de preguntas persistido en SQLite con índices por ID, categoría y dificultad.
+
+La sincronización la hace el propio banco al refrescarse o un job externo:
+
+    QUESTIONS_SQLITE_PATH=banco.db python -m sqlite_store sync
+"""
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections.abc import Mapping, Sequence
+
+from question_bank import QUESTIONS_CACHE_TTL, BankSnapshot, QuestionBank
+from questions import OPTION_CODES, parse_question_row
+
+logger = logging.getLogger(__name__)
+
+# Base SQLite que reemplaza al banco en memoria
+QUESTIONS_SQLITE_PATH = os.environ.get('QUESTIONS_SQLITE_PATH')
+
+# Cada cuánto un worker revisa si otro proceso sincronizó la base
+SQLITE_CHECK_INTERVAL = 1.0
+
+# Misma disposición de columnas que SqliteSource, así la base también sirve como origen.
+# ``posicion`` es el rowid: las preguntas ocupan 0..n-1 sin huecos.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS preguntas (
+    posicion INTEGER PRIMARY KEY,
+    id TEXT NOT NULL,
+    pregunta TEXT NOT NULL,
+    opcion_a TEXT,
+    opcion_b TEXT,
+    opcion_c TEXT,
+    opcion_d TEXT,
+    respuesta_correcta TEXT NOT NULL,
+    categoria TEXT NOT NULL DEFAULT '',
+    dificultad TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_preguntas_id ON preguntas(id);
+CREATE INDEX IF NOT EXISTS idx_preguntas_categoria ON preguntas(categoria);
+CREATE INDEX IF NOT EXISTS idx_preguntas_dificultad ON preguntas(dificultad);
+CREATE TABLE IF NOT EXISTS meta (
+    clave TEXT PRIMARY KEY,
+    valor TEXT
+);
+"""
+
+_COLUMNS = "id, pregunta, opcion_a, opcion_b, opcion_c, opcion_d, respuesta_correcta, categoria, dificultad"
+
+# Atributo de Question -> columna indexada
+_STRATA_COLUMNS = {
+    "category": "categoria",
+    "difficulty": "dificultad"
+}
+
+
+class GenerationChanged(Exception):
+    """Otro proceso sincronizó la base después de publicada la versión que se está leyendo"""
+
+
+def _row_to_question(posicion, row):
+    return parse_question_row([value or "" for value in row], posicion + 2)
+
+
+class SqliteQuestionStore:
+    """Acceso a la base; cada hilo usa su propia conexión"""
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None: las transacciones se abren explícitamente
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        return conn
+
+    def meta(self):
+        rows = self._conn().execute("SELECT clave, valor FROM meta").fetchall()
+        return dict(rows)
+
+    def sync(self, questions, total_rows, revision, conn=None):
+        """Reemplaza el contenido de la base por ``questions`` en una sola transacción"""
+        own_transaction = conn is None
+        conn = conn or self._conn()
+        if own_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = dict(conn.execute("SELECT clave, valor FROM meta").fetchall())
+            generation = int(meta.get("generacion", 0)) + 1
+            conn.execute("DELETE FROM preguntas")
+            conn.executemany(
+                f"INSERT INTO preguntas (posicion, {_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._question_row(i, q) for i, q in enumerate(questions))
+            )
+            self._write_meta(conn, {
+                "generacion": generation,
+                "preguntas": len(questions),
+                "filas_totales": total_rows,
+                "revision": revision,
+                "sincronizado": time.time()
+            })
+            if own_transaction:
+                conn.execute("COMMIT")
+        except BaseException:
+            if own_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return generation
+
+    def touch(self, conn=None):
+        """Renueva la fecha de sincronización sin tocar las preguntas"""
+        self._write_meta(conn or self._conn(), {"sincronizado": time.time()})
+
+    @staticmethod
+    def _write_meta(conn, values):
+        conn.executemany(
+            "INSERT OR REPLACE INTO meta (clave, valor) VALUES (?, ?)",
+            [(clave, None if valor is None else str(valor)) for clave, valor in values.items()]
+        )
+
+    @staticmethod
+    def _question_row(posicion, q):
+        por_codigo = dict(zip(q.codes, q.options))
+        return (
+            posicion, q.id, q.text,
+            *(por_codigo.get(code) for code in OPTION_CODES),
+            q.answer, q.category, q.difficulty
+        )
+
+    def get(self, posicion, generation=None):
+        """Pregunta en ``posicion``; con ``generation`` lanza GenerationChanged si la base ya es otra"""
+        # Fila y generación en la misma sentencia: SQLite las lee de una sola versión de la base
+        row = self._conn().execute(
+            f"SELECT {_COLUMNS}, (SELECT valor FROM meta WHERE clave = 'generacion') "
+            f"FROM preguntas WHERE posicion = ?", (posicion,)
+        ).fetchone()
+        if generation is not None:
+            self.check_generation(generation, row[-1] if row else None)
+        return _row_to_question(posicion, row[:-1]) if row else None
+
+    def check_generation(self, generation, current=None):
+        """Lanza GenerationChanged si la base ya no está en ``generation``.
+
+        ``current`` es la generación leída junto con los datos; sin ella (la
+        consulta no devolvió filas) se lee de meta.
+        """
+        if current is None:
+            current = self.meta().get("generacion")
+        if int(current or 0) != generation:
+            raise GenerationChanged(f"La base pasó de la generación {generation} a la {current}")
+
+    def lookup(self, question_id):
+        """Pregunta por ID con el índice; si el ID se repite gana la última fila"""
+        row = self._conn().execute(
+            f"SELECT posicion, {_COLUMNS} FROM preguntas WHERE id = ? ORDER BY posicion DESC LIMIT 1",
+            (question_id,)
+        ).fetchone()
+        return _row_to_question(row[0], row[1:]) if row else None
+
+    def count_ids(self):
+        return self._conn().execute("SELECT COUNT(DISTINCT id) FROM preguntas").fetchone()[0]
+
+    def iter_ids(self):
+        for (question_id,) in self._conn().execute("SELECT DISTINCT id FROM preguntas ORDER BY id"):
+            yield question_id
+
+    def strata(self, field, generation=None):
+        """Posiciones agrupadas por categoría o dificultad, leídas del índice.
+
+        Con ``generation`` lanza GenerationChanged si la base ya es otra.
+        """
+        column = _STRATA_COLUMNS[field]
+        # Igual que en get(): las posiciones y la generación salen de la misma sentencia
+        rows = self._conn().execute(
+            f"SELECT {column}, posicion, (SELECT valor FROM meta WHERE clave = 'generacion') "
+            f"FROM preguntas ORDER BY {column}, posicion"
+        ).fetchall()
+        if generation is not None:
+            self.check_generation(generation, rows[0][-1] if rows else None)
+        strata = {}
+        for value, posicion, _ in rows:
+            positions = strata.get(value)
+            if positions is None:
+                positions = strata[value] = array("I")
+            positions.append(posicion)
+        return strata
+
+
+class StoreQuestions(Sequence):
+    """Secuencia de preguntas de una generación de la base, leídas por posición (rowid).
+
+    Si otro proceso sincronizó la base desde entonces, la lectura lanza
+    GenerationChanged (después de avisar con ``on_changed``) en lugar de
+    devolver filas de otra generación o quedarse sin fila.
+    """
+
+    def __init__(self, store, count, generation=None, on_changed=None):
+        self._store = store
+        self._count = count
+        self._generation = generation
+        self._on_changed = on_changed
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        try:
+            if 0 <= i < len(self):
+                question = self._store.get(i, self._generation)
+            else:
+                # Una posición de otra generación puede caer fuera de rango: primero se descarta eso
+                question = None
+                if self._generation is not None:
+                    self._store.check_generation(self._generation)
+        except GenerationChanged:
+            self._changed()
+            raise
+        if question is None:
+            raise IndexError("índice de pregunta fuera de rango")
+        return question
+
+    def strata(self, field):
+        try:
+            return self._store.strata(field, self._generation)
+        except GenerationChanged:
+            self._changed()
+            raise
+
+    def _changed(self):
+        if self._on_changed is not None:
+            self._on_changed()
+
+
+class StoreIndex(Mapping):
+    """Índice ID -> pregunta resuelto con el índice de SQLite"""
+
+    def __init__(self, store):
+        self._store = store
+
+    def __len__(self):
+        return self._store.count_ids()
+
+    def __iter__(self):
+        return self._store.iter_ids()
+
+    def __getitem__(self, question_id):
+        question = self._store.lookup(question_id) if isinstance(question_id, str) else None
+        if question is None:
+            raise KeyError(question_id)
+        return question
+
+
+class SqliteQuestionBank(QuestionBank):
+    """Banco de preguntas servido desde SQLite en lugar de memoria.
+
+    Las validaciones buscan por ID con el índice y el muestreo elige
+    posiciones (rowids) al azar, así que ninguna petición carga el banco
+    completo. El refresco sincroniza la base con el origen dentro de una
+    transacción ``BEGIN IMMEDIATE``, que además hace de lock entre workers:
+    el que llega después ve la base recién sincronizada y no descarga.
+    """
+
+    def __init__(self, loader, store, ttl=QUESTIONS_CACHE_TTL, get_revision=None):
+        super().__init__(loader, ttl=ttl, get_revision=get_revision, snapshot_path=None)
+        self.store = store
+        self._last_check = 0.0
+        self._synced_at = None
+
+    def _publish(self, meta):
+        # La edad se mide con la fecha de sincronización, común a todos los procesos
+        age = time.time() - float(meta.get("sincronizado", 0))
+        self._synced_at = meta.get("sincronizado")
+        generation = int(meta["generacion"])
+        with self._state_lock:
+            self._snapshot = BankSnapshot(
+                generation, StoreQuestions(self.store, int(meta["preguntas"]), generation, self._expire_check),
+                int(meta.get("filas_totales", 0)), time.monotonic() - age,
+                meta.get("revision"), index=StoreIndex(self.store)
+            )
+        return self._snapshot
+
+    def _expire_check(self):
+        # La próxima get() vuelve a leer meta y publica la generación nueva
+        self._last_check = 0.0
+
+    def get(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is not None and now - self._last_check >= SQLITE_CHECK_INTERVAL:
+            # Otro proceso pudo haber sincronizado la base
+            self._last_check = now
+            meta = self.store.meta()
+            if int(meta.get("generacion", 0)) != snapshot.version or \
+                    meta.get("sincronizado") != self._synced_at:
+                self._publish(meta)
+        return super().get()
+
+    def load_snapshot(self):
+        """Publica lo que ya tenga la base, sin consultar el origen"""
+        if self._snapshot is not None:
+            return False
+        meta = self.store.meta()
+        if "generacion" not in meta:
+            return False
+        self._publish(meta)
+        self.loaded_from_snapshot = True
+        logger.info("Banco cargado desde %s: %d preguntas", self.store.path, int(meta['preguntas']))
+        return True
+
+    def _do_refresh(self):
+        self._last_attempt = time.monotonic()
+        conn = self.store._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            meta = self.store.meta()
+            synced = "generacion" in meta
+            if synced and time.time() - float(meta["sincronizado"]) < self.ttl:
+                # Otro worker acaba de sincronizar
+                conn.execute("COMMIT")
+                return self._publish(meta)
+
+            revision = self._current_revision()
+            if synced and revision is not None and revision == meta.get("revision"):
+                self.store.touch(conn)
+                conn.execute("COMMIT")
+                self.skipped_refreshes += 1
+                return self._publish(self.store.meta())
+
+            try:
+                questions, total_rows = self._loader()[:2]
+            except Exception as e:
+                self.refresh_errors += 1
+                self.last_error = f"{type(e).__name__}: {str(e)}"
+                raise
+            self.store.sync(questions, total_rows, revision, conn=conn)
+            conn.execute("COMMIT")
+            self.refreshes += 1
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        return self._publish(self.store.meta())
+
+    def stats(self):
+        stats = super().stats()
+        stats["base_sqlite"] = self.store.path
+        return stats
+
+
+def main():
+    """Job de sincronización: copia el origen configurado a la base SQLite"""
+    if len(sys.argv) != 2 or sys.argv[1] != "sync":
+        print("Uso: QUESTIONS_SQLITE_PATH=banco.db python -m sqlite_store sync")
+        sys.exit(2)
+    if not QUESTIONS_SQLITE_PATH:
+        print("QUESTIONS_SQLITE_PATH no configurado")
+        sys.exit(2)
+
+    from questions import IncrementalParser
+    from sources import source_from_env
+    from structured_logging import setup_logging
+
+    setup_logging()
+
+    source = source_from_env()
+    store = SqliteQuestionStore(QUESTIONS_SQLITE_PATH)
+    revision = source.get_revision()
+    if revision is not None and revision == store.meta().get("revision"):
+        store.touch()
+        logger.info("Sin cambios en el origen (revisión %s)", revision)
+        return
+
+    parser = IncrementalParser()
+    questions, _ = parser.parse_blocks(source.iter_blocks())
+    generation = store.sync(questions, parser.last_rows, revision)
+    logger.info("Sincronizadas %d preguntas (generación %d)", len(questions), generation)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Logs estructurados (una línea JSON por evento) que no bloquean las peticiones.
+
+Los módulos usan ``logging.getLogger(__name__)`` y ``setup_logging()``
+instala en el logger raíz un QueueHandler: el hilo que registra el evento
+solo lo formatea y lo encola, y un QueueListener en su propio hilo lo
+escribe en stdout. Cada línea lleva el ID de la petición en curso
+(``request_id``), que app.py y asgi.py fijan al recibirla.
+
+- LOG_LEVEL: DEBUG, INFO (por defecto), WARNING o ERROR.
+- LOG_FORMAT: ``json`` (por defecto) o ``texto`` para desarrollo local.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import time
+import uuid
+
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json')
+
+# ID de la petición que atiende el hilo o la tarea actual
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Atributos propios de LogRecord; el resto viene de ``extra`` y se agrega a la línea
+_RESERVED = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_queue = None
+
+
+def new_request_id(incoming=None):
+    """Fija el ID de la petición actual (el recibido en X-Request-ID o uno nuevo) y lo devuelve"""
+    request_id = incoming if incoming and len(incoming) <= 128 else uuid.uuid4().hex[:16]
+    request_id_var.set(request_id)
+    return request_id
+
+
+class RequestIdFilter(logging.Filter):
+    """Copia el ID de la petición al registro, en el hilo que lo emite"""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "nivel": record.levelname,
+            "logger": record.name,
+            "mensaje": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["excepcion"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s")
+
+
+class _PreformattedQueueHandler(logging.handlers.QueueHandler):
+    """Formatea en el hilo que emite (donde está el contexto) y encola la línea final"""
+
+    def prepare(self, record):
+        record = super().prepare(record)
+        # La línea ya es el JSON/texto completo: el listener solo la escribe
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+
+def _start_listener():
+    global _listener
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(message)s"))
+    _listener = logging.handlers.QueueListener(_queue, stream, respect_handler_level=False)
+    _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None:
+        _listener.stop()
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Configura el logger raíz una sola vez por proceso"""
+    global _queue
+    if _queue is not None:
+        return
+    _queue = queue.SimpleQueue()
+
+    handler = _PreformattedQueueHandler(_queue)
+    handler.addFilter(RequestIdFilter())
+    handler.setFormatter(TextFormatter() if fmt == "texto" else JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level)
+
+    _start_listener()
+    atexit.register(_stop_listener)
+    # Con --preload de gunicorn el hilo del listener no sobrevive al fork
+    os.register_at_fork(after_in_child=_start_listener)
@@ -0,0 +1,112 @@
+"""IncrementalParser y apply_changes contra un parseo y un índice completos."""
+import random
+
+import pytest
+
+from question_bank import apply_changes, build_index
+from questions import IncrementalParser, parse_rows
+
+HEADER = ["ID", "Pregunta", "A", "B", "C", "D", "Respuesta", "Categoría", "Dificultad"]
+
+
+def make_rows(count):
+    rows = [list(HEADER)]
+    for i in range(count):
+        rows.append([
+            f"P{i:04d}", f"Pregunta {i}", f"a{i}", f"b{i}", f"c{i}" if i % 3 else "", "",
+            "ABC"[i % 3], ("Historia", "Arte")[i % 2], ("facil", "media")[i % 2]
+        ])
+    # Sin ID (usa el número de fila) y con una sola opción (se descarta)
+    rows.append(["", "Pregunta sin ID", "a", "b", "", "", "A", "", ""])
+    rows.append(["X1", "Una sola opción", "a", "", "", "", "A", "", ""])
+    return rows
+
+
+def mutate(rows, rnd, step):
+    rows = [list(row) for row in rows]
+    i = rnd.randrange(1, len(rows))
+    op = rnd.randrange(6)
+    if op == 0:
+        rows[i][1] += " (editada)"
+    elif op == 1:
+        del rows[i]
+    elif op == 2:
+        rows.insert(i, [f"N{step}", f"Nueva {step}", "a", "b", "c", "d", "B", "Ciencia", "dificil"])
+    elif op == 3:
+        # ID repetido: gana la última fila
+        rows.insert(i, list(rows[i]))
+    elif op == 4:
+        rows[i][6] = "D"
+    else:
+        rows[i][0] = ""
+    return rows
+
+
+def as_tuples(questions):
+    return [
+        (q.id, q.text, q.codes, q.options, q.answer, q.category, q.difficulty) for q in questions
+    ]
+
+
+def test_first_parse_matches_full_parse_without_changes():
+    rows = make_rows(50)
+    questions, changes = IncrementalParser().parse(rows)
+    assert changes is None
+    assert as_tuples(questions) == as_tuples(parse_rows(rows))
+
+
+def test_unchanged_rows_reuse_the_same_objects():
+    rows = make_rows(50)
+    parser = IncrementalParser()
+    first, _ = parser.parse(rows)
+    rows[10][1] = "Otra pregunta"
+    second, changes = parser.parse(rows)
+
+    edited = rows[10][0]
+    assert [q.id for q in changes.upserted] == [edited]
+    assert [q.id for q in changes.removed] == [edited]
+    assert changes.modified == 1 and changes.added == 0
+    assert all(a is b for a, b in zip(first, second) if a.id != edited)
+    # La editada y la inválida, que no deja pregunta para reutilizar
+    assert parser.last_parsed == 2
+    # Los acumulados no bajan entre refrescos (se exportan como counter)
+    assert parser.total_parsed == len(rows) - 1 + 2
+    assert parser.total_reused == len(rows) - 1 - 2
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_random_edits_match_full_reparse(seed):
+    rnd = random.Random(seed)
+    rows = make_rows(200)
+    parser = IncrementalParser()
+    questions, _ = parser.parse(rows)
+    index = build_index(questions)
+
+    for step in range(60):
+        rows = mutate(rows, rnd, step)
+        questions, changes = parser.parse(rows)
+        assert as_tuples(questions) == as_tuples(parse_rows(rows)), step
+
+        expected = build_index(questions)
+        updated = apply_changes(index, questions, changes)
+        if updated is not None:
+            assert updated.keys() == expected.keys(), step
+            assert all(updated[key] is expected[key] for key in expected), step
+        index = expected if updated is None else updated
+
+
+def test_blocks_match_a_single_parse():
+    rows = make_rows(100)
+    blocks = [(start, rows[start - 1:start + 24]) for start in range(1, len(rows) + 1, 25)]
+    questions, _ = IncrementalParser().parse_blocks(blocks)
+    assert as_tuples(questions) == as_tuples(parse_rows(rows))
+
+
+def test_apply_changes_gives_up_on_duplicate_ids():
+    rows = make_rows(20)
+    parser = IncrementalParser()
+    questions, _ = parser.parse(rows)
+    index = build_index(questions)
+    rows.append(list(rows[5]))
+    questions, changes = parser.parse(rows)
+    assert apply_changes(index, questions, changes) is None
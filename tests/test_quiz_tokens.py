@@ -0,0 +1,82 @@
+"""Verificación de los tokens de quiz: válidos, alterados, vencidos y de otro secreto."""
+import base64
+import json
+
+import pytest
+
+from questions import Question
+from quiz_tokens import InvalidToken, QuizTokenSigner
+
+QUESTIONS = [
+    Question(f"P{i}", f"Pregunta {i}", "ABC", ("a", "b", "c"), "ABC"[i % 3]) for i in range(40)
+]
+
+
+def b64(data):
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def unb64(text):
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+@pytest.fixture
+def signer():
+    return QuizTokenSigner("secreto", ttl=60)
+
+
+def test_valid_token_round_trips(signer):
+    token = signer.issue("historia", QUESTIONS, now=1000)
+    claims = signer.verify(token, now=1030)
+    assert claims.quiz_id == "historia"
+    assert (claims.issued_at, claims.expires_at) == (1000, 1060)
+    assert list(claims.answers) == [q.id for q in QUESTIONS]
+    assert [a.answer for a in claims.answers.values()] == [q.answer for q in QUESTIONS]
+    assert signer.stats()["verificados"] == 1
+
+
+def test_answers_are_not_readable_in_the_token(signer):
+    token = signer.issue("historia", QUESTIONS, now=1000)
+    body = json.loads(unb64(token.split(".")[0]))
+    assert body["ids"] == [q.id for q in QUESTIONS]
+    answer_key = json.dumps([q.answer for q in QUESTIONS], separators=(",", ":")).encode("utf-8")
+    assert len(unb64(body["k"])) == len(answer_key)
+    assert unb64(body["k"]) != answer_key
+
+
+def test_tampered_body_is_rejected(signer):
+    token = signer.issue("historia", QUESTIONS, now=1000)
+    body_text, signature = token.split(".")
+    body = json.loads(unb64(body_text))
+    body["exp"] += 3600
+    forged = b64(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+    with pytest.raises(InvalidToken, match="Firma"):
+        signer.verify(f"{forged}.{signature}", now=1030)
+
+
+def test_tampered_signature_is_rejected(signer):
+    token = signer.issue("historia", QUESTIONS, now=1000)
+    body_text, signature = token.split(".")
+    flipped = bytes([unb64(signature)[0] ^ 1]) + unb64(signature)[1:]
+    with pytest.raises(InvalidToken, match="Firma"):
+        signer.verify(f"{body_text}.{b64(flipped)}", now=1030)
+
+
+def test_expired_token_is_rejected(signer):
+    token = signer.issue("historia", QUESTIONS, now=1000)
+    signer.verify(token, now=1060)
+    with pytest.raises(InvalidToken, match="vencido"):
+        signer.verify(token, now=1061)
+
+
+def test_token_from_another_secret_is_rejected(signer):
+    token = QuizTokenSigner("otro secreto", ttl=60).issue("historia", QUESTIONS, now=1000)
+    with pytest.raises(InvalidToken, match="Firma"):
+        signer.verify(token, now=1030)
+    assert signer.stats()["rechazados"] == 1
+
+
+@pytest.mark.parametrize("token", ["", "sin-punto", "a.b.c", "no base64!.x", None, 5])
+def test_malformed_token_is_rejected(signer, token):
+    with pytest.raises(InvalidToken):
+        signer.verify(token, now=1030)
@@ -0,0 +1,91 @@
+"""Formato binario del banco compartido y búsqueda binaria por ID."""
+import pytest
+
+from question_bank import build_index
+from questions import Question
+from shared_bank import MappedIndex, MappedQuestions, SharedBankView, write_shared_bank
+
+
+def question(question_id, text="Pregunta", options=("a", "b"), codes="AB", answer="A", category="", difficulty=""):
+    return Question(question_id, text, codes, options, answer, category, difficulty)
+
+
+def fields(q):
+    return (q.id, q.text, q.codes, q.options, q.answer, q.category, q.difficulty)
+
+
+@pytest.fixture
+def questions():
+    bank = [
+        question(f"P{i:03d}", f"Pregunta {i} ¿ñandú?", ("a", "b", "c", "d")[:2 + i % 3], "ABCD"[:2 + i % 3],
+                 "ABCD"[i % 2], ("Historia", "Arte")[i % 2], "media")
+        for i in range(0, 200, 2)
+    ]
+    # IDs fuera de orden, no ASCII y repetidos (gana la última fila, como en build_index)
+    bank += [question("zeta"), question("Ñu"), question("árbol"), question("P010", text="Repetida"), question("")]
+    return bank
+
+
+@pytest.fixture
+def view(tmp_path, questions):
+    path = tmp_path / "banco.bin"
+    write_shared_bank(str(path), questions, total_rows=321, revision="rev-7", generation=3)
+    return SharedBankView(str(path))
+
+
+def test_header_round_trips(view, questions):
+    assert view.count == len(questions)
+    assert view.id_count == len(build_index(questions))
+    assert (view.generation, view.total_rows, view.revision) == (3, 321, "rev-7")
+
+
+def test_records_round_trip(view, questions):
+    assert [fields(view.question_at(i)) for i in range(view.count)] == [fields(q) for q in questions]
+    mapped = MappedQuestions(view)
+    assert fields(mapped[-1]) == fields(questions[-1])
+    assert [fields(q) for q in mapped[3:6]] == [fields(q) for q in questions[3:6]]
+    with pytest.raises(IndexError):
+        mapped[len(questions)]
+
+
+def test_ids_are_sorted_by_bytes(view):
+    ids = [view.id_at(slot)[0] for slot in range(view.id_count)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_find_every_id(view, questions):
+    expected = build_index(questions)
+    for question_id, q in expected.items():
+        assert fields(view.question_at(view.find(question_id))) == fields(q)
+    assert view.question_at(view.find("P010")).text == "Repetida"
+
+
+@pytest.mark.parametrize("missing", ["A", "P001", "P0105", "P199", "zz", "árbo", "Ñ"])
+def test_find_missing_ids(view, missing):
+    assert view.find(missing) is None
+
+
+def test_mapped_index_matches_build_index(view, questions):
+    index = MappedIndex(view)
+    expected = build_index(questions)
+    assert len(index) == len(expected)
+    assert set(index) == set(expected)
+    assert fields(index["árbol"]) == fields(expected["árbol"])
+    assert index.get("no-existe") is None
+    assert index.get(5) is None
+
+
+def test_empty_bank(tmp_path):
+    path = tmp_path / "vacio.bin"
+    write_shared_bank(str(path), [], total_rows=1, revision=None, generation=1)
+    view = SharedBankView(str(path))
+    assert (view.count, view.id_count, view.revision) == (0, 0, None)
+    assert view.find("P000") is None
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "otro.bin"
+    path.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        SharedBankView(str(path))